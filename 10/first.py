@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 
 import sys
-from collections import defaultdict
+from array import array
+from itertools import repeat
+from operator import add, mul
 
-inp = defaultdict(lambda: [])
-lines = (l.strip() for l in sys.stdin.readlines())
-for line in lines:
+def parse_line(line):
     line = line[10:].partition(',')
     x = int(line[0])
     
@@ -16,39 +16,99 @@ for line in lines:
     vx = int(line[0])
     
     vy = int(line[2][:-1])
-    inp[(x,y)].append((vx,vy))
-
-def step(points, time):
-    bounds = [0,0,0,0]
-    new_points = defaultdict(lambda: [])
-
-    for point_loc in points.keys():
-        for point_vel in points[point_loc]:
-            new_loc = (point_loc[0]+point_vel[0], point_loc[1]+point_vel[1])
-            bounds[0] = min(point_loc[0], bounds[0])
-            bounds[1] = min(point_loc[1], bounds[1])
-            bounds[2] = max(point_loc[0], bounds[2])
-            bounds[3] = max(point_loc[1], bounds[3])
-            new_points[new_loc].append(point_vel)
-
-    # print(bounds)
-    # print((bounds[2]-bounds[0]) * (bounds[3]-bounds[1]))
-    
-    
-    if abs(time - 10942) < 10:
-        for y in range(bounds[1], bounds[3]+1):
-            for x in range(bounds[0], bounds[2]+1):
-                if (x,y) in points:
-                    print('#', end='')
-                else:
-                    print('.', end='')
-            print()
-    
-    return new_points
+    return (x, y, vx, vy)
+
+def positions_at(points, t):
+    return [(x + vx * t, y + vy * t) for x, y, vx, vy in points]
+
+def bounds_at(points, t):
+    xs = [x + vx * t for x, _, vx, _ in points]
+    ys = [y + vy * t for _, y, _, vy in points]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+def area_at(points, t):
+    min_x, min_y, max_x, max_y = bounds_at(points, t)
+    return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+def spread_at(points, t):
+    min_x, min_y, max_x, max_y = bounds_at(points, t)
+    return (max_x - min_x) + (max_y - min_y)
+
+def areas_at(points, times):
+    times = list(times)
+    xs = [[x + vx * t for x, _, vx, _ in points] for t in times]
+    ys = [[y + vy * t for _, y, _, vy in points] for t in times]
+    return [(max(row_x) - min(row_x) + 1) * (max(row_y) - min(row_y) + 1) for row_x, row_y in zip(xs, ys)]
+
+class Sky(object):
+    def __init__(self, points):
+        self.points = points
+        self.xs = array('q', (p[0] for p in points))
+        self.ys = array('q', (p[1] for p in points))
+        self.vxs = array('q', (p[2] for p in points))
+        self.vys = array('q', (p[3] for p in points))
+        self.time = 0
+
+    def step(self, steps=1):
+        self.xs = array('q', map(add, self.xs, map(mul, self.vxs, repeat(steps))))
+        self.ys = array('q', map(add, self.ys, map(mul, self.vys, repeat(steps))))
+        self.time += steps
+
+    def bounds(self):
+        return (min(self.xs), min(self.ys), max(self.xs), max(self.ys))
+
+    def estimate_time(self):
+        n = len(self.xs)
+        mean_x, mean_y = sum(self.xs) / n, sum(self.ys) / n
+        mean_vx, mean_vy = sum(self.vxs) / n, sum(self.vys) / n
+        numerator = 0
+        denominator = 0
+        for x, y, vx, vy in zip(self.xs, self.ys, self.vxs, self.vys):
+            dx, dy = x - mean_x, y - mean_y
+            dvx, dvy = vx - mean_vx, vy - mean_vy
+            numerator += dx * dvx + dy * dvy
+            denominator += dvx * dvx + dvy * dvy
+        if denominator == 0:
+            return self.time
+        return self.time + max(0, round(-numerator / denominator))
+
+    def converge(self):
+        t = self.estimate_time()
+        spread = spread_at(self.points, t)
+        for direction in (-1, 1):
+            while t + direction >= 0:
+                next_spread = spread_at(self.points, t + direction)
+                if next_spread >= spread:
+                    break
+                t += direction
+                spread = next_spread
+        self.step(t - self.time)
+        return self.time
+
+    def render(self):
+        min_x, min_y, max_x, max_y = self.bounds()
+        width = max_x - min_x + 1
+        rows = [bytearray(b'.') * width for _ in range(max_y - min_y + 1)]
+        for x, y in zip(self.xs, self.ys):
+            rows[y - min_y][x - min_x] = ord('#')
+        write_bytes(b'\n'.join(rows) + b'\n')
 
+def write_bytes(out):
+    sys.stdout.flush()
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if buffer is None:
+        sys.stdout.write(out.decode('utf-8'))
+    else:
+        buffer.write(out)
 
-for t in range(50000):
-    print("\nTime: %d" % t)
-    inp = step(inp, t)
+points = [parse_line(l.strip()) for l in sys.stdin.readlines() if l.strip()]
+if len(sys.argv) > 1:
+    times = [int(t) for t in sys.argv[1:]]
+    for t, area in zip(times, areas_at(points, times)):
+        print('%d %d' % (t, area))
+    sys.exit(0)
 
-# print(inp)
+sky = Sky(points)
+sky.converge()
+sky.render()
+print(sky.time)
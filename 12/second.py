@@ -3,12 +3,15 @@
 import sys
 from collections import defaultdict
 from itertools import dropwhile
+from functools import lru_cache
 
 RULE_SIZE=5
 RULE_MIDDLE_OFFSET=2
 ROUND_COUNT=20
 
 WOOT = 2**RULE_SIZE-1
+TABLE_WINDOW = 8 + RULE_SIZE - 1
+TABLE_MASK = 2**TABLE_WINDOW-1
 
 def print_state(state):
   min_index = min(state.keys())
@@ -35,6 +38,10 @@ def step(state, rules):
   return new_state
 
 def step2(state, rules):
+  new_state, _ = step2_offset(state, rules)
+  return new_state
+
+def step2_offset(state, rules):
   new_state = 0
   for i in range(state.bit_length()+RULE_SIZE):
     pattern = (state << RULE_SIZE >> i) & WOOT
@@ -42,9 +49,122 @@ def step2(state, rules):
     if val:
       new_state += (1 << i)
 
-  while new_state&1 == 0:
+  shift = RULE_SIZE - RULE_MIDDLE_OFFSET
+  while new_state and new_state&1 == 0:
     new_state=new_state>>1
-  return new_state
+    shift -= 1
+  return new_state, shift
+
+def build_table2(rules):
+  table = bytearray(1 << TABLE_WINDOW)
+  for window in range(1 << TABLE_WINDOW):
+    out = 0
+    for i in range(8):
+      if rules[(window >> i) & WOOT]:
+        out |= 1 << i
+    table[window] = out
+  return bytes(table)
+
+def step2_table(state, table):
+  padded = (state << 8).to_bytes(state.bit_length() // 8 + 3, 'little')
+  out = bytes(table[((lo | hi << 8) >> (8 - RULE_SIZE)) & TABLE_MASK] for lo, hi in zip(padded, padded[1:]))
+  new_state = int.from_bytes(out, 'little')
+
+  shift = RULE_SIZE - RULE_MIDDLE_OFFSET
+  if new_state:
+    zeros = (new_state & -new_state).bit_length() - 1
+    new_state >>= zeros
+    shift -= zeros
+  return new_state, shift
+
+def normalize2(state, right):
+  while state and state&1 == 0:
+    state=state>>1
+    right -= 1
+  return state, right
+
+def pot_sum2(state, right):
+  return sum(right - i for i in range(state.bit_length()) if (state >> i) & 1)
+
+def run2(state, right, rules, generations):
+  table = build_table2(rules)
+  state, right = normalize2(state, right)
+  seen = {}
+  history = []
+  generation = 0
+  while generation < generations:
+    if state in seen:
+      first_generation = seen[state]
+      period = generation - first_generation
+      drift = right - history[first_generation][1]
+      cycles, remainder = divmod(generations - generation, period)
+      state, right = history[first_generation + remainder]
+      return state, right + drift * (cycles + 1)
+
+    seen[state] = generation
+    history.append((state, right))
+    state, shift = step2_table(state, table)
+    right += shift
+    generation += 1
+  return state, right
+
+class MacroStepper(object):
+  def __init__(self, rules, level=4, block_width=64, cache_size=1 << 16):
+    assert block_width % 8 == 0
+    self.table = build_table2(rules)
+    self.generations = 1 << level
+    self.radius = RULE_MIDDLE_OFFSET * self.generations
+    self.block_width = block_width
+    self.future = lru_cache(maxsize=cache_size)(self._future)
+
+  def _future(self, window):
+    state, right = normalize2(window, 0)
+    for _ in range(self.generations):
+      state, shift = step2_table(state, self.table)
+      right += shift
+    offset = right + self.radius
+    if offset < 0:
+      state <<= -offset
+    else:
+      state >>= offset
+    return state & ((1 << self.block_width) - 1)
+
+  def step(self, state, right):
+    width = state.bit_length() + 2 * self.radius
+    span = self.block_width + 2 * self.radius
+    mask = (1 << span) - 1
+    padded = (state << (2 * self.radius)).to_bytes((width + span) // 8 + 2, 'little')
+    out = bytearray()
+    for start in range(0, width, self.block_width):
+      window = int.from_bytes(padded[start // 8:start // 8 + span // 8 + 1], 'little') & mask
+      out += self.future(window).to_bytes(self.block_width // 8, 'little')
+    return normalize2(int.from_bytes(out, 'little'), right + self.radius)
+
+def run_macro2(state, right, rules, generations, level):
+  stepper = MacroStepper(rules, level)
+  state, right = normalize2(state, right)
+  steps = generations >> level
+  seen = {}
+  history = []
+  step = 0
+  while step < steps:
+    if state in seen:
+      first_step = seen[state]
+      period = step - first_step
+      drift = right - history[first_step][1]
+      cycles, remainder = divmod(steps - step, period)
+      state, right = history[first_step + remainder]
+      right += drift * (cycles + 1)
+      break
+
+    seen[state] = step
+    history.append((state, right))
+    state, right = stepper.step(state, right)
+    step += 1
+  for _ in range(generations & (stepper.generations - 1)):
+    state, shift = step2_table(state, stepper.table)
+    right += shift
+  return state, right, stepper.future.cache_info()
 
 def parse_initial(lines):
   state = defaultdict(lambda: '.')
@@ -72,17 +192,28 @@ def show_sum(state):
 def show_sum2(state):
   print(sum(i for i, bit in enumerate(bin(state)[2:]) if bit == '1'))
 
+GENERATION_COUNT=50000000000
+MACRO_LEVEL=4
+
+args = sys.argv[1:]
+macro_mode = len(args) > 0 and args[0] == 'macro'
+if macro_mode:
+  args = args[1:]
+if len(args) > 0:
+  GENERATION_COUNT = int(args[0])
+if len(args) > 1:
+  MACRO_LEVEL = int(args[1])
+
 lines = [l.strip() for l in sys.stdin.readlines()]
 
-state = parse_initial(lines)
-rules = parse_rules(lines)
-
-last = 0
-for i in range(100):
-  this = show_sum(state)
-  print('%d %d %d' % (i, this - last, this))
-  last = this
-  # print('%d %d' % (i, show_sum(state)))
-  # print_state(state)
-  state = step(state, rules)
-# show_sum(state)
+state = parse_initial2(lines)
+right = len(lines[0][15:]) - 1
+rules = parse_rules2(lines)
+
+if macro_mode:
+  state, right, info = run_macro2(state, right, rules, GENERATION_COUNT, MACRO_LEVEL)
+  lookups = info.hits + info.misses
+  print('cache hits %d, misses %d (%.1f%% hit rate), %d cached blocks' % (info.hits, info.misses, 100.0 * info.hits / max(lookups, 1), info.currsize), file=sys.stderr)
+else:
+  state, right = run2(state, right, rules, GENERATION_COUNT)
+print(pot_sum2(state, right))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+from io import StringIO
+
+import tracks
+
+# name, width, height, cart count, loop step, minimum gap between carts
+CONFIGS = [
+    # thousands of carts packed on one big loop: crashes every few ticks
+    # until a single cart is left
+    ('dense', 1000, 1000, 3001, 600, 1),
+    # a few hundred carts far apart on long loops: the first crash takes a
+    # while and skipping has straight runs to leap along
+    ('spaced', 2000, 2000, 200, 256, 150),
+]
+TICK_LIMIT=10000
+
+def timed(label, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print('%-28s %8.3fs' % (label, time.perf_counter() - start))
+    return result
+
+def benchmark(name, width, height, cart_count, step, min_gap):
+    print('%s: %dx%d, %d carts, step %d, gap %d' % (name, width, height, cart_count, step, min_gap))
+    text = timed('generate', tracks.generate_tracks, width, height, cart_count, step, min_gap)
+    layout = timed('compile layout', tracks.compile_layout, StringIO(text))
+    print('%d carts placed' % len(layout.carts))
+
+    for skip_quiet in (False, True):
+        mode = 'skipping' if skip_quiet else 'stepping'
+        crash = timed('first crash (%s)' % mode, tracks.Simulation(layout, skip_quiet).advance, TICK_LIMIT)
+        if crash is None:
+            print('  no crash before tick limit %d' % TICK_LIMIT)
+        else:
+            print('  tick %d at %d,%d' % (crash[0], crash[1][0], crash[1][1]))
+
+        sim = tracks.Simulation(layout, skip_quiet)
+        last = timed('last cart (%s)' % mode, sim.last_cart, TICK_LIMIT)
+        if last is None:
+            print('  %d carts left at tick limit %d' % (len(sim.occupied), TICK_LIMIT))
+        else:
+            print('  tick %d at %d,%d' % (sim.tick, last[0], last[1]))
+        print('  %d moves skipped' % sim.skipped_moves)
+
+if len(sys.argv) > 1:
+    args = [int(arg) for arg in sys.argv[1:]]
+    name, width, height, cart_count, step, min_gap = CONFIGS[0]
+    defaults = [width, height, cart_count, step, min_gap]
+    benchmark('custom', *(args + defaults[len(args):]))
+else:
+    for config in CONFIGS:
+        benchmark(*config)
+        print()
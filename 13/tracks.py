@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+
+import sys
+from textwrap import dedent
+from io import StringIO
+import os.path
+import heapq
+import random
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+
+CART_DIRECTIONS = ['^', '>', 'v', '<']
+UP = CART_DIRECTIONS.index('^')
+RIGHT = CART_DIRECTIONS.index('>')
+DOWN = CART_DIRECTIONS.index('v')
+LEFT = CART_DIRECTIONS.index('<')
+STRAIGHT = len(CART_DIRECTIONS)
+
+DECISIONS = {(UP, LEFT):        (LEFT, STRAIGHT),
+             (UP, STRAIGHT):    (UP, RIGHT),
+             (UP, RIGHT):       (RIGHT, LEFT),
+             (RIGHT, LEFT):     (UP, STRAIGHT),
+             (RIGHT, STRAIGHT): (RIGHT, RIGHT),
+             (RIGHT, RIGHT):    (DOWN, LEFT),
+             (DOWN, LEFT):      (RIGHT, STRAIGHT),
+             (DOWN, STRAIGHT):  (DOWN, RIGHT),
+             (DOWN, RIGHT):     (LEFT, LEFT),
+             (LEFT, LEFT):      (DOWN, STRAIGHT),
+             (LEFT, STRAIGHT):  (LEFT, RIGHT),
+             (LEFT, RIGHT):     (UP, LEFT)}
+
+def on_intersection(current_direction, next_decision):
+    """
+    >>> on_intersection(UP, LEFT)
+    (3, 4)
+    >>> on_intersection(UP, STRAIGHT)
+    (0, 1)
+    >>> on_intersection(UP, RIGHT)
+    (1, 3)
+    """
+    return DECISIONS[(current_direction, next_decision)]
+
+TURN_STATES = [LEFT, STRAIGHT, RIGHT]
+STATES_PER_CELL = len(CART_DIRECTIONS) * len(TURN_STATES)
+DIRECTION_DELTAS = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+TRACK_UNDER_CART = {'^': '|', 'v': '|', '<': '-', '>': '-'}
+STRAIGHT_CHARS = set('-|^v<>')
+BUCKET_SIZE = 32
+STEP_LEASE = 16
+MIN_LEAP = 8
+MAX_LEAP = (BUCKET_SIZE - 3) // 2
+
+Layout = namedtuple('Layout', ['width', 'height', 'transitions', 'runs', 'carts'])
+
+def entering(char, direction, turn):
+    """
+    >>> entering('/', UP, 0)
+    (1, 0)
+    >>> entering('\\\\', UP, 0)
+    (3, 0)
+    >>> entering('+', UP, 0)
+    (3, 1)
+    >>> entering('+', UP, 2)
+    (1, 0)
+    """
+    if char == '/':
+        direction = [RIGHT, UP, LEFT, DOWN][direction]
+    elif char == '\\':
+        direction = [LEFT, DOWN, RIGHT, UP][direction]
+    elif char == '+':
+        direction, next_decision = on_intersection(direction, TURN_STATES[turn])
+        turn = TURN_STATES.index(next_decision)
+    return (direction, turn)
+
+ENTERING = {}
+for char in '-|/\\+':
+    ENTERING[char] = []
+    for direction in range(len(CART_DIRECTIONS)):
+        codes = [entering(char, direction, turn) for turn in range(len(TURN_STATES))]
+        ENTERING[char].append([d * len(TURN_STATES) + t for d, t in codes])
+
+def state_typecode(cell_count):
+    if cell_count * STATES_PER_CELL < 2**31:
+        return 'i'
+    return 'q'
+
+def compile_layout(stream):
+    """
+    >>> inp = r'''
+    ... /->-\\
+    ... |   |
+    ... \\---/
+    ... '''
+    >>> layout = compile_layout(StringIO(dedent(inp).strip()))
+    >>> layout.width, layout.height, layout.carts
+    (5, 3, (27,))
+    >>> state = layout.transitions[layout.carts[0]]
+    >>> divmod(state, STATES_PER_CELL), layout.transitions[state] // STATES_PER_CELL
+    ((3, 3), 4)
+    >>> divmod(layout.transitions[layout.transitions[state]], STATES_PER_CELL)
+    (9, 6)
+    """
+    lines = [k.rstrip() for k in stream.readlines()]
+    width = max(len(line) for line in lines)
+    height = len(lines)
+    grid = ''.join(line.ljust(width) for line in lines)
+
+    transitions = array(state_typecode(width * height), [-1]) * (width * height * STATES_PER_CELL)
+    carts = []
+    for cell, char in enumerate(grid):
+        if char == ' ':
+            continue
+        if char in CART_DIRECTIONS:
+            carts.append(cell * STATES_PER_CELL + CART_DIRECTIONS.index(char) * len(TURN_STATES))
+
+        x, y = cell % width, cell // width
+        for direction, (dx, dy) in enumerate(DIRECTION_DELTAS):
+            if not (0 <= x + dx < width and 0 <= y + dy < height):
+                continue
+            next_cell = cell + dy * width + dx
+            next_char = grid[next_cell]
+            next_char = TRACK_UNDER_CART.get(next_char, next_char)
+            if next_char == ' ':
+                continue
+            base = cell * STATES_PER_CELL + direction * len(TURN_STATES)
+            for turn, code in enumerate(ENTERING[next_char][direction]):
+                transitions[base + turn] = next_cell * STATES_PER_CELL + code
+
+    return Layout(width, height, transitions, straight_runs(grid, width), tuple(carts))
+
+def straight_runs(grid, width):
+    """
+    >>> runs = straight_runs('-->+', 4)
+    >>> [runs[cell * len(CART_DIRECTIONS) + RIGHT] for cell in range(4)]
+    [2, 1, 0, 0]
+    >>> [runs[cell * len(CART_DIRECTIONS) + LEFT] for cell in range(4)]
+    [0, 1, 2, 3]
+    """
+    directions = len(CART_DIRECTIONS)
+    runs = array(state_typecode(len(grid)), [0]) * (len(grid) * directions)
+    for cell in range(len(grid)):
+        if grid[cell] == ' ':
+            continue
+        if cell >= width and grid[cell - width] in STRAIGHT_CHARS:
+            runs[cell * directions + UP] = runs[(cell - width) * directions + UP] + 1
+        if cell % width > 0 and grid[cell - 1] in STRAIGHT_CHARS:
+            runs[cell * directions + LEFT] = runs[(cell - 1) * directions + LEFT] + 1
+    for cell in reversed(range(len(grid))):
+        if grid[cell] == ' ':
+            continue
+        if cell + width < len(grid) and grid[cell + width] in STRAIGHT_CHARS:
+            runs[cell * directions + DOWN] = runs[(cell + width) * directions + DOWN] + 1
+        if cell % width < width - 1 and grid[cell + 1] in STRAIGHT_CHARS:
+            runs[cell * directions + RIGHT] = runs[(cell + 1) * directions + RIGHT] + 1
+    return runs
+
+@lru_cache(maxsize=None)
+def load_layout(path):
+    with open(path) as stream:
+        return compile_layout(stream)
+
+class Simulation(object):
+    """
+    >>> inp = r'''
+    ... /->-\\        
+    ... |   |  /----\\
+    ... | /-+--+-\\  |
+    ... | | |  | v  |
+    ... \\-+-/  \\-+--/
+    ...   \\------/   
+    ... '''
+    >>> sim = Simulation(compile_layout(StringIO(dedent(inp).strip())))
+    >>> sim.advance()
+    (13, (7, 3))
+    >>> sim.advance() is None
+    True
+
+    >>> inp = r'''
+    ... />-<\\  
+    ... |   |  
+    ... | /<+-\\
+    ... | | | v
+    ... \\>+</ |
+    ...   |   ^
+    ...   \\<->/
+    ... '''
+    >>> layout = compile_layout(StringIO(dedent(inp).strip()))
+    >>> sim = Simulation(layout)
+    >>> sim.advance()
+    (0, (2, 0))
+    >>> sim.last_cart()
+    (6, 4)
+    >>> Simulation(layout).last_cart()
+    (6, 4)
+    >>> Simulation(layout, skip_quiet=True).last_cart()
+    (6, 4)
+
+    >>> inp = '/' + '-' * 98 + '\\\\\\n\\\\>' + '-' * 96 + '</'
+    >>> layout = compile_layout(StringIO(inp))
+    >>> Simulation(layout).advance()
+    (48, (50, 1))
+    >>> sim = Simulation(layout, skip_quiet=True)
+    >>> sim.advance()
+    (48, (50, 1))
+    >>> sim.skipped_moves
+    65
+    """
+    def __init__(self, layout, skip_quiet=False):
+        self.layout = layout
+        self.skip_quiet = skip_quiet
+        self.skipped_moves = 0
+        self.carts = list(layout.carts)
+        self.occupied = {}
+        self.queue = []
+        self.tick = -1
+        for cart_id, state in enumerate(self.carts):
+            cell = state // STATES_PER_CELL
+            self.occupied[cell] = cart_id
+            self.queue.append((0, cell, cart_id))
+        heapq.heapify(self.queue)
+
+        if skip_quiet:
+            self.bucket_width = layout.width // BUCKET_SIZE + 3
+            self.bucket_counts = [0] * (self.bucket_width * (layout.height // BUCKET_SIZE + 3))
+            self.spans = [None] * len(self.carts)
+            self.leases = [STEP_LEASE] * len(self.carts)
+            self.retries = [0] * len(self.carts)
+            for cart_id, state in enumerate(self.carts):
+                cell = state // STATES_PER_CELL
+                self._place(cart_id, cell, cell, STEP_LEASE)
+
+    def loc(self, cell):
+        return (cell % self.layout.width, cell // self.layout.width)
+
+    def _place(self, cart_id, from_cell, to_cell, margin=0):
+        """
+        Records the box a cart stays inside until its lease runs out: the
+        straight path of a leap, or the cells within margin of a cart that
+        is stepping. Every bucket the box touches counts the cart.
+        """
+        width = self.layout.width
+        x0, y0 = from_cell % width, from_cell // width
+        x1, y1 = to_cell % width, to_cell // width
+        span = ((min(x0, x1) - margin) // BUCKET_SIZE + 1, (min(y0, y1) - margin) // BUCKET_SIZE + 1,
+                (max(x0, x1) + margin) // BUCKET_SIZE + 1, (max(y0, y1) + margin) // BUCKET_SIZE + 1)
+        if span != self.spans[cart_id]:
+            self._remove(cart_id)
+            self._count(span, 1)
+            self.spans[cart_id] = span
+
+    def _remove(self, cart_id):
+        if self.spans[cart_id] is not None:
+            self._count(self.spans[cart_id], -1)
+            self.spans[cart_id] = None
+
+    def _count(self, span, change):
+        for by in range(span[1], span[3] + 1):
+            for bx in range(span[0], span[2] + 1):
+                self.bucket_counts[by * self.bucket_width + bx] += change
+
+    def _clear(self, cart_id, cell):
+        """
+        Whether no other cart's box touches the bucket holding cell or any
+        of its eight neighbours. Every cell outside those nine buckets is at
+        least BUCKET_SIZE steps from cell.
+        """
+        width = self.layout.width
+        bx, by = cell % width // BUCKET_SIZE + 1, cell // width // BUCKET_SIZE + 1
+        x0, y0, x1, y1 = self.spans[cart_id]
+        for y in (by - 1, by, by + 1):
+            row = y * self.bucket_width
+            for x in (bx - 1, bx, bx + 1):
+                own = x0 <= x <= x1 and y0 <= y <= y1
+                if self.bucket_counts[row + x] > own:
+                    return False
+        return True
+
+    def _move_next(self):
+        self.tick, cell, cart_id = heapq.heappop(self.queue)
+        state = self.carts[cart_id]
+        if state is None:
+            return None
+
+        if self.skip_quiet and self.tick >= self.retries[cart_id]:
+            run = self.layout.runs[state // len(TURN_STATES)]
+            if run >= MIN_LEAP:
+                if self._clear(cart_id, cell):
+                    self._leap(cart_id, cell, state, min(run, MAX_LEAP))
+                    return None
+                self.retries[cart_id] = self.tick + STEP_LEASE
+
+        state = self.layout.transitions[state]
+        new_cell = state // STATES_PER_CELL
+        del self.occupied[cell]
+        if new_cell in self.occupied:
+            other_id = self.occupied.pop(new_cell)
+            self.carts[other_id] = None
+            self.carts[cart_id] = None
+            if self.skip_quiet:
+                self._remove(other_id)
+                self._remove(cart_id)
+            return self.loc(new_cell)
+
+        self.occupied[new_cell] = cart_id
+        self.carts[cart_id] = state
+        if self.skip_quiet and self.tick + 1 > self.leases[cart_id]:
+            self._place(cart_id, new_cell, new_cell, STEP_LEASE)
+            self.leases[cart_id] = self.tick + 1 + STEP_LEASE
+        heapq.heappush(self.queue, (self.tick + 1, new_cell, cart_id))
+        return None
+
+    def _leap(self, cart_id, cell, state, leap):
+        """
+        Moves a cart on a straight run several cells in one event. The leap
+        is short enough that no other cart can come within two cells of its
+        path before it lands, so no crash is missed and the landing cell can
+        be claimed straight away.
+        """
+        direction = state // len(TURN_STATES) % len(CART_DIRECTIONS)
+        dx, dy = DIRECTION_DELTAS[direction]
+        state += leap * (dy * self.layout.width + dx) * STATES_PER_CELL
+        new_cell = state // STATES_PER_CELL
+        del self.occupied[cell]
+        self.occupied[new_cell] = cart_id
+        self.carts[cart_id] = state
+        self._place(cart_id, cell, new_cell)
+        self.leases[cart_id] = self.tick + leap
+        heapq.heappush(self.queue, (self.tick + leap, new_cell, cart_id))
+        self.skipped_moves += leap - 1
+
+    def advance(self, until_tick=None):
+        while len(self.occupied) > 1:
+            if until_tick is not None and self.queue[0][0] >= until_tick:
+                return None
+            crash = self._move_next()
+            if crash:
+                return (self.tick, crash)
+        return None
+
+    def last_cart(self, until_tick=None):
+        while len(self.occupied) > 1:
+            if self.advance(until_tick) is None and len(self.occupied) > 1:
+                return None
+        if len(self.occupied) == 0:
+            return None
+
+        cart_id = next(iter(self.occupied.values()))
+        tick, cell = next((tick, cell) for tick, cell, other in self.queue if other == cart_id)
+        if tick == self.tick:
+            cell = self.layout.transitions[self.carts[cart_id]] // STATES_PER_CELL
+            tick += 1
+        direction = self.carts[cart_id] // len(TURN_STATES) % len(CART_DIRECTIONS)
+        dx, dy = DIRECTION_DELTAS[direction]
+        cell -= (tick - self.tick - 1) * (dy * self.layout.width + dx)
+        return self.loc(cell)
+
+def first_crash(layout, skip_quiet=False):
+    """
+    >>> inp = r'''
+    ... /->-\\        
+    ... |   |  /----\\
+    ... | /-+--+-\\  |
+    ... | | |  | v  |
+    ... \\-+-/  \\-+--/
+    ...   \\------/   
+    ... '''
+    >>> first_crash(compile_layout(StringIO(dedent(inp).strip())))
+    (7, 3)
+    """
+    crash = Simulation(layout, skip_quiet).advance()
+    if crash is None:
+        return None
+    return crash[1]
+
+def last_cart(layout, skip_quiet=False):
+    """
+    >>> inp = r'''
+    ... />-<\\  
+    ... |   |  
+    ... | /<+-\\
+    ... | | | v
+    ... \\>+</ |
+    ...   |   ^
+    ...   \\<->/
+    ... '''
+    >>> last_cart(compile_layout(StringIO(dedent(inp).strip())))
+    (6, 4)
+    """
+    return Simulation(layout, skip_quiet).last_cart()
+
+def generate_tracks(width, height, cart_count, step=8, min_gap=1, seed=0):
+    """
+    >>> print(generate_tracks(21, 21, 3, min_gap=12, seed=1))
+    /----<------\\
+    |           |
+    |           |
+    |           |
+    |           |
+    |           v
+    |           |
+    |           |
+    |       /---+-------\\
+    |       |   |       |
+    |       |   |       |
+    |       |   |       |
+    \\-------+---/       |
+            |           |
+            |           |
+            |           |
+            |           |
+            |           |
+            v           |
+            |           |
+            \\-----------/
+    """
+    size = step + step // 2
+    rows = [bytearray(b' ') * width for _ in range(height)]
+    for y0 in range(0, height - size, step):
+        for x0 in range((y0 // step) % 2 * step, width - size, 2 * step):
+            x1, y1 = x0 + size, y0 + size
+            for x in range(x0 + 1, x1):
+                for y in (y0, y1):
+                    rows[y][x] = ord('+') if rows[y][x] == ord('|') else ord('-')
+            for y in range(y0 + 1, y1):
+                for x in (x0, x1):
+                    rows[y][x] = ord('+') if rows[y][x] == ord('-') else ord('|')
+            rows[y0][x0] = rows[y1][x1] = ord('/')
+            rows[y0][x1] = rows[y1][x0] = ord('\\')
+
+    rng = random.Random(seed)
+    straight = [(x, y) for y, row in enumerate(rows) for x, c in enumerate(row) if c in b'-|']
+    rng.shuffle(straight)
+    buckets = {}
+    placed = 0
+    for x, y in straight:
+        if placed >= cart_count:
+            break
+        bx, by = x // min_gap, y // min_gap
+        if any(abs(x - x1) + abs(y - y1) < min_gap
+               for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+               for x1, y1 in buckets.get((bx + dx, by + dy), [])):
+            continue
+        buckets.setdefault((bx, by), []).append((x, y))
+        placed += 1
+        if rows[y][x] == ord('-'):
+            rows[y][x] = ord(rng.choice('<>'))
+        else:
+            rows[y][x] = ord(rng.choice('^v'))
+    return '\n'.join(row.decode('ascii').rstrip() for row in rows).rstrip()
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] in ('first', 'last') and os.path.isfile(sys.argv[2]):
+        layout = load_layout(sys.argv[2])
+        if sys.argv[1] == 'first':
+            print('%d,%d' % first_crash(layout))
+        else:
+            print('%d,%d' % last_cart(layout))
+
+    else:
+        import doctest
+        doctest.testmod()
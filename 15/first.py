@@ -199,26 +199,32 @@ class Map(object):
         self.size = (col_count, row_count)
 
     def __repr__(self):
-        out = ''
-        for i in range(self.size[1]):
-            units = []
-            for j in range(self.size[0]):
-                loc = Loc(j,i)
-                if loc in self.yes_wall:
-                    out += '#'
-                elif loc in self.goblins:
-                    out += 'G'
-                    units.append(self.goblins[loc])
-                elif loc in self.elves:
-                    out += 'E'
-                    units.append(self.elves[loc])
-                else:
-                    out += '.'
+        """
+        Rows are as wide as the widest line, so short or blank lines in the
+        input render padded rather than cut off.
+
+        >>> repr(Map(StringIO('####\\n#GE#\\n##\\n\\n'))).split('\\n')
+        ['####   ', '#GE#   G(200), E(200)', '##     ']
+        """
+        cells = self.yes_wall + self.no_wall
+        width = max(loc.x for loc in cells) + 1 if cells else 0
+        height = max(loc.y for loc in cells) + 1 if cells else 0
+        rows = [bytearray(b' ') * width for _ in range(height)]
+        row_units = [[] for _ in range(height)]
+        for loc in self.no_wall:
+            rows[loc.y][loc.x] = ord('.')
+        for loc in self.yes_wall:
+            rows[loc.y][loc.x] = ord('#')
+        for units in (self.goblins, self.elves):
+            for loc, unit in units.items():
+                rows[loc.y][loc.x] = ord(unit.char())
+                row_units[loc.y].append((loc.x, unit))
 
-            out += '   '
-            out += ', '.join(str(unit) for unit in units)
-            out += '\n'
-        return out[:-1]
+        lines = []
+        for row, units in zip(rows, row_units):
+            units.sort(key=lambda tup: tup[0])
+            lines.append('%s   %s' % (row.decode('ascii'), ', '.join(str(unit) for _, unit in units)))
+        return '\n'.join(lines)
     
     def units(self):
         """
@@ -9,11 +9,30 @@ from collections import defaultdict, namedtuple
 import os.path
 import math
 import types
-import copy
 
 OPS = ['addr', 'addi', 'mulr', 'muli', 'banr', 'bani', 'borr', 'bori',
        'setr', 'seti', 'gtir', 'gtri', 'gtrr', 'eqri', 'eqir', 'eqrr']
 
+OP_VALUES = {
+  'addr': lambda r, A, B: r[A] + r[B],
+  'addi': lambda r, A, B: r[A] + B,
+  'mulr': lambda r, A, B: r[A] * r[B],
+  'muli': lambda r, A, B: r[A] * B,
+  'banr': lambda r, A, B: r[A] & r[B],
+  'bani': lambda r, A, B: r[A] & B,
+  'borr': lambda r, A, B: r[A] | r[B],
+  'bori': lambda r, A, B: r[A] | B,
+  'setr': lambda r, A, B: r[A],
+  'seti': lambda r, A, B: A,
+  'gtir': lambda r, A, B: int(A > r[B]),
+  'gtri': lambda r, A, B: int(r[A] > B),
+  'gtrr': lambda r, A, B: int(r[A] > r[B]),
+  'eqir': lambda r, A, B: int(A == r[B]),
+  'eqri': lambda r, A, B: int(r[A] == B),
+  'eqrr': lambda r, A, B: int(r[A] == r[B]),
+}
+OP_TABLE = tuple(OP_VALUES[op_name] for op_name in OPS)
+
 class Computer(object):
   def __init__(self, A=0, B=0, C=0, D=0):
     self.registers = [A, B, C, D]
@@ -40,75 +59,33 @@ class Computer(object):
     """
     return self.registers == other.registers
   
-  def addr(self, A, B, C):
-    self.registers[C] = self.registers[A] + self.registers[B]
-  
-  def addi(self, A, B, C):
-    self.registers[C] = self.registers[A] + B
-  
-  def mulr(self, A, B, C):
-    self.registers[C] = self.registers[A] * self.registers[B]
-  
-  def muli(self, A, B, C):
-    self.registers[C] = self.registers[A] * B
-  
-  def banr(self, A, B, C):
-    self.registers[C] = self.registers[A] & self.registers[B]
-  
-  def bani(self, A, B, C):
-    self.registers[C] = self.registers[A] & B
-  
-  def borr(self, A, B, C):
-    self.registers[C] = self.registers[A] | self.registers[B]
-  
-  def bori(self, A, B, C):
-    self.registers[C] = self.registers[A] | B
-  
-  def setr(self, A, _, C):
-    self.registers[C] = self.registers[A]
-  
-  def seti(self, A, _, C):
-    self.registers[C] = A
-
-  def gtir(self, A, B, C):
-    self.registers[C] = int(A > self.registers[B])
-  
-  def gtri(self, A, B, C):
-    self.registers[C] = int(self.registers[A] > B)
-  
-  def gtrr(self, A, B, C):
-    self.registers[C] = int(self.registers[A] > self.registers[B])
-  
-  def eqir(self, A, B, C):
-    self.registers[C] = int(A == self.registers[B])
-  
-  def eqri(self, A, B, C):
-    self.registers[C] = int(self.registers[A] == B)
-  
-  def eqrr(self, A, B, C):
-    self.registers[C] = int(self.registers[A] == self.registers[B])
-  
   def execute():
     pass
 
+def op_method(op_value):
+  def method(self, A, B, C):
+    self.registers[C] = op_value(self.registers, A, B)
+  return method
+
+for op_name in OPS:
+  setattr(Computer, op_name, op_method(OP_VALUES[op_name]))
+
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
     pass
 
-def grouplen(l, n):
-  'https://stackoverflow.com/a/312464/111777'
-  return [l[i:i + n] for i in range(0, len(l), n)]
-
-def computer_from(blah):
+def registers_from(line):
   """
-  >>> computer_from('Before: [1, 0, 2, 0]')
-  Computer[1, 0, 2, 0]
+  >>> registers_from('Before: [1, 0, 2, 0]')
+  (1, 0, 2, 0)
   """
-  numbers = blah.partition(':')[2].lstrip()
-  return Computer(*(int(b) for b in numbers[1:-1].split(', ')))
+  return tuple(int(b) for b in line.partition('[')[2].partition(']')[0].split(','))
 
 def parse(stream):
   """
+  Yields (before, operation, after) tuples straight from the stream's line
+  iterator, stopping at the first line that doesn't start a sample.
+
   >>> inp = r'''
   ... Before: [1, 0, 2, 0]
   ... 4 1 0 1
@@ -119,8 +96,8 @@ def parse(stream):
   ... After:  [2, 1, 1, 2]
   ... 
   ... f'''
-  >>> parse(StringIO(dedent(inp).strip()))
-  [(Computer[1, 0, 2, 0], [4, 1, 0, 1], Computer[1, 1, 2, 0]), (Computer[2, 3, 1, 2], [2, 1, 0, 1], Computer[2, 1, 1, 2])]
+  >>> list(parse(StringIO(dedent(inp).strip())))
+  [((1, 0, 2, 0), (4, 1, 0, 1), (1, 1, 2, 0)), ((2, 3, 1, 2), (2, 1, 0, 1), (2, 1, 1, 2))]
   
   >>> inp = r'''
   ... Before: [2, 0, 1, 0]
@@ -134,43 +111,46 @@ def parse(stream):
   ... 9 0 1 2
   ... 3 1 2 2
   ... '''
-  >>> parse(StringIO(dedent(inp).strip()))
-  [(Computer[2, 0, 1, 0], [11, 1, 0, 2], Computer[2, 0, 1, 0])]
+  >>> list(parse(StringIO(dedent(inp).strip())))
+  [((2, 0, 1, 0), (11, 1, 0, 2), (2, 0, 1, 0))]
   """
-  lines = [l.strip() for l in stream.readlines()]
-  groups = grouplen(lines, 4)
-  samples = []
-  for i, group in enumerate(groups):
-    if len(group) != 4: break
-    if group[0] == '': break
-    
-    before, operation, after, _ = group
+  lines = iter(stream)
+  for line in lines:
+    if line.startswith('Before'):
+      operation = tuple(int(b) for b in next(lines).split())
+      yield (registers_from(line), operation, registers_from(next(lines)))
+    elif line.strip():
+      return
 
-    before = computer_from(before)
-    operation = [int(b) for b in operation.split(' ')]
-    after = computer_from(after)
+def sample_mask(before, operation, after):
+  """
+  >>> bin(sample_mask([3, 2, 1, 1], [9, 2, 1, 2], [3, 2, 2, 1]))
+  '0b1000000110'
+  >>> sample_mask([3, 2, 1, 1], [9, 2, 1, 2], [0, 2, 2, 1])
+  0
+  """
+  _, A, B, C = operation
+  for i in range(len(before)):
+    if i != C and before[i] != after[i]:
+      return 0
 
-    samples.append((before, operation, after))
-    
-  return samples
+  expected = after[C]
+  mask = 0
+  for i, op_value in enumerate(OP_TABLE):
+    if op_value(before, A, B) == expected:
+      mask |= 1 << i
+  return mask
 
 def blah(samples, threshold):
   """
-  >>> samples = [(Computer(1, 0, 2, 0), [4, 1, 0, 1], Computer(1, 1, 2, 0)), (Computer(2, 3, 1, 2), [2, 1, 0, 1], Computer(2, 1, 1, 2))]
+  >>> samples = [((1, 0, 2, 0), (4, 1, 0, 1), (1, 1, 2, 0)), ((2, 3, 1, 2), (2, 1, 0, 1), (2, 1, 1, 2))]
   >>> blah(samples, 3)
   1
   """
   samples_above_threshold = 0
-  for initial_before, operation_parameters, after in samples:
-    matching_ops = 0
-    for operation_name in OPS:
-      before = copy.deepcopy(initial_before)
-      operation = getattr(before, operation_name)
-      operation.__call__(*operation_parameters[1:])
-      
-      if before == after:
-        matching_ops += 1
-    if matching_ops >= threshold:
+  for before, operation, after in samples:
+    mask = sample_mask(before, operation, after)
+    if bin(mask).count('1') >= threshold:
       samples_above_threshold += 1
   return samples_above_threshold
     
@@ -2,18 +2,87 @@
 
 import sys
 from textwrap import dedent
-from itertools import product, chain, islice, zip_longest, count
+from itertools import product, chain, islice, zip_longest, count, repeat
 import heapq
 from io import StringIO
 from collections import defaultdict, namedtuple
 import os.path
 import math
 import types
-import copy
+import random
+import time
+from array import array
+from operator import add, mul, and_, or_, gt, eq
 
 OPS = ['addr', 'addi', 'mulr', 'muli', 'banr', 'bani', 'borr', 'bori',
        'setr', 'seti', 'gtir', 'gtri', 'gtrr', 'eqri', 'eqir', 'eqrr']
 
+REGISTER, IMMEDIATE = 'r', 'i'
+
+def first(a, _):
+  return a
+
+# Each op is defined once as (function, A operand, B operand). The scalar
+# OP_VALUES and the column-wise BATCH_OPS are both built from this table.
+OP_SPECS = {
+  'addr': (add, REGISTER, REGISTER),
+  'addi': (add, REGISTER, IMMEDIATE),
+  'mulr': (mul, REGISTER, REGISTER),
+  'muli': (mul, REGISTER, IMMEDIATE),
+  'banr': (and_, REGISTER, REGISTER),
+  'bani': (and_, REGISTER, IMMEDIATE),
+  'borr': (or_, REGISTER, REGISTER),
+  'bori': (or_, REGISTER, IMMEDIATE),
+  'setr': (first, REGISTER, IMMEDIATE),
+  'seti': (first, IMMEDIATE, IMMEDIATE),
+  'gtir': (gt, IMMEDIATE, REGISTER),
+  'gtri': (gt, REGISTER, IMMEDIATE),
+  'gtrr': (gt, REGISTER, REGISTER),
+  'eqir': (eq, IMMEDIATE, REGISTER),
+  'eqri': (eq, REGISTER, IMMEDIATE),
+  'eqrr': (eq, REGISTER, REGISTER),
+}
+
+COMPARISONS = (gt, eq)
+
+def op_value(function, a_mode, b_mode):
+  """
+  >>> op_value(gt, IMMEDIATE, REGISTER)((1, 5, 0, 0), 3, 1)
+  0
+  >>> op_value(add, REGISTER, IMMEDIATE)((1, 5, 0, 0), 1, 7)
+  12
+  """
+  if a_mode == REGISTER and b_mode == REGISTER:
+    return lambda r, A, B: int(function(r[A], r[B]))
+  if a_mode == REGISTER:
+    return lambda r, A, B: int(function(r[A], B))
+  if b_mode == REGISTER:
+    return lambda r, A, B: int(function(A, r[B]))
+  return lambda r, A, B: int(function(A, B))
+
+def batch_op(function, a_mode, b_mode):
+  """
+  >>> list(batch_op(gt, IMMEDIATE, REGISTER)([[0, 0], [5, 2], [0, 0], [0, 0]], 3, 1))
+  [0, 1]
+  """
+  def run(columns, A, B):
+    a = columns[A] if a_mode == REGISTER else repeat(A, len(columns[0]))
+    b = columns[B] if b_mode == REGISTER else repeat(B, len(columns[0]))
+    values = map(function, a, b)
+    return map(int, values) if function in COMPARISONS else values
+  return run
+
+OP_VALUES = dict((op_name, op_value(*spec)) for op_name, spec in OP_SPECS.items())
+OP_TABLE = tuple(OP_VALUES[op_name] for op_name in OPS)
+BATCH_OPS = dict((op_name, batch_op(*spec)) for op_name, spec in OP_SPECS.items())
+assert set(OP_SPECS) == set(OPS)
+ALL_OPS_MASK = 2**len(OPS)-1
+MAPPING_LIMIT = 100
+
+class OpcodeMappingException(Exception):
+  def __init__(self, mappings):
+    self.mappings = mappings
+
 class Computer(object):
   def __init__(self, A=0, B=0, C=0, D=0, opcode_mapping=None):
     self.registers = [A, B, C, D]
@@ -41,77 +110,164 @@ class Computer(object):
     """
     return self.registers == other.registers
   
-  def addr(self, A, B, C):
-    self.registers[C] = self.registers[A] + self.registers[B]
-  
-  def addi(self, A, B, C):
-    self.registers[C] = self.registers[A] + B
-  
-  def mulr(self, A, B, C):
-    self.registers[C] = self.registers[A] * self.registers[B]
-  
-  def muli(self, A, B, C):
-    self.registers[C] = self.registers[A] * B
-  
-  def banr(self, A, B, C):
-    self.registers[C] = self.registers[A] & self.registers[B]
-  
-  def bani(self, A, B, C):
-    self.registers[C] = self.registers[A] & B
-  
-  def borr(self, A, B, C):
-    self.registers[C] = self.registers[A] | self.registers[B]
-  
-  def bori(self, A, B, C):
-    self.registers[C] = self.registers[A] | B
-  
-  def setr(self, A, _, C):
-    self.registers[C] = self.registers[A]
-  
-  def seti(self, A, _, C):
-    self.registers[C] = A
-
-  def gtir(self, A, B, C):
-    self.registers[C] = int(A > self.registers[B])
-  
-  def gtri(self, A, B, C):
-    self.registers[C] = int(self.registers[A] > B)
-  
-  def gtrr(self, A, B, C):
-    self.registers[C] = int(self.registers[A] > self.registers[B])
-  
-  def eqir(self, A, B, C):
-    self.registers[C] = int(A == self.registers[B])
-  
-  def eqri(self, A, B, C):
-    self.registers[C] = int(self.registers[A] == B)
-  
-  def eqrr(self, A, B, C):
-    self.registers[C] = int(self.registers[A] == self.registers[B])
-  
   def execute(self, op, A, B, C):
     op_name = self.opcode_mapping[op]
     operation = getattr(self, op_name)
     operation.__call__(A, B, C)
 
+  def compile(self):
+    """
+    Resolves the opcode mapping once into a tuple of OP_VALUES functions,
+    indexed by opcode, each taking (registers, A, B) and returning the
+    value for register C.
+
+    >>> c = Computer(opcode_mapping=['seti', 'addi'])
+    >>> operations = c.compile()
+    >>> operations[1]([0, 3, 0, 0], 1, 5)
+    8
+    """
+    return tuple(OP_VALUES[op_name] for op_name in self.opcode_mapping)
+
+  def run(self, program):
+    """
+    >>> c = Computer(opcode_mapping=['seti', 'addi', 'mulr'])
+    >>> c.run(decode([[0, 3, 0, 1], [1, 1, 4, 2], [2, 1, 2, 3]]))
+    >>> c
+    Computer[0, 3, 7, 21]
+    """
+    operations = self.compile()
+    registers = self.registers
+    ops, As, Bs, Cs = program
+    for op, A, B, C in zip(ops, As, Bs, Cs):
+      registers[C] = operations[op](registers, A, B)
+
+def op_method(op_value):
+  def method(self, A, B, C):
+    self.registers[C] = op_value(self.registers, A, B)
+  return method
+
+for op_name in OPS:
+  setattr(Computer, op_name, op_method(OP_VALUES[op_name]))
+
+class BatchComputer(object):
+  """
+  Runs one program on many register vectors at once. Registers are held
+  as four columns and every instruction rewrites one whole column, so the
+  per-instruction dispatch is paid once per batch rather than per machine.
+
+  >>> b = BatchComputer([(0, 0, 0, 0), (1, 2, 3, 4)], opcode_mapping=['seti', 'addr', 'gtri'])
+  >>> b.run(decode([[1, 0, 1, 2], [2, 2, 0, 3], [0, 7, 0, 0]]))
+  >>> b
+  BatchComputer[(7, 0, 0, 0), (7, 2, 3, 1)]
+  """
+  def __init__(self, registers, opcode_mapping=None):
+    self.columns = [list(column) for column in zip(*registers)] or [[], [], [], []]
+    self.opcode_mapping = opcode_mapping
+
+  def __repr__(self):
+    return 'BatchComputer%s' % self.rows()
+
+  def rows(self):
+    return list(zip(*self.columns))
+
+  def run(self, program):
+    operations = tuple(BATCH_OPS[op_name] for op_name in self.opcode_mapping)
+    columns = self.columns
+    ops, As, Bs, Cs = program
+    for op, A, B, C in zip(ops, As, Bs, Cs):
+      columns[C] = list(operations[op](columns, A, B))
+
+def check_batch(program, registers, opcode_mapping=OPS):
+  """
+  Runs the program through BatchComputer and through Computer.execute one
+  row at a time, returning the rows where the two disagree.
+
+  >>> rng = random.Random(1)
+  >>> registers = [tuple(rng.randrange(8) for _ in range(4)) for _ in range(50)]
+  >>> check_batch(synthetic_program(200), registers)
+  []
+  """
+  batch = BatchComputer(registers, opcode_mapping=opcode_mapping)
+  batch.run(decode(program))
+
+  mismatches = []
+  for row, (initial, result) in enumerate(zip(registers, batch.rows())):
+    c = Computer(*initial, opcode_mapping=opcode_mapping)
+    for instruction in program:
+      c.execute(*instruction)
+    if tuple(c.registers) != result:
+      mismatches.append(row)
+  return mismatches
+
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
     pass
 
-def grouplen(l, n):
-  'https://stackoverflow.com/a/312464/111777'
-  return [l[i:i + n] for i in range(0, len(l), n)]
+def decode(program):
+  """
+  >>> decode([[4, 1, 0, 1], [2, 3, 3, 0]])
+  (array('B', [4, 2]), array('l', [1, 3]), array('l', [0, 3]), array('l', [1, 0]))
+  """
+  decoded = (array('B'), array('l'), array('l'), array('l'))
+  for instruction in program:
+    for column, value in zip(decoded, instruction):
+      column.append(value)
+  return decoded
+
+def synthetic_program(length, seed=0):
+  rng = random.Random(seed)
+  return [[rng.randrange(len(OPS)), rng.randrange(4), rng.randrange(4), rng.randrange(4)] for _ in range(length)]
+
+def benchmark(length):
+  program = synthetic_program(length)
+  decoded = decode(program)
+
+  c = Computer(opcode_mapping=OPS)
+  start = time.perf_counter()
+  for op in program:
+    c.execute(*op)
+  interpreted = time.perf_counter() - start
+
+  compiled_computer = Computer(opcode_mapping=OPS)
+  start = time.perf_counter()
+  compiled_computer.run(decoded)
+  compiled = time.perf_counter() - start
+
+  assert c == compiled_computer
+  print('execute: %.0f instructions/s' % (length / interpreted))
+  print('run:     %.0f instructions/s' % (length / compiled))
+
+def batch_benchmark(length, machines):
+  program = synthetic_program(length)
+  decoded = decode(program)
+  rng = random.Random(0)
+  registers = [tuple(rng.randrange(16) for _ in range(4)) for _ in range(machines)]
+
+  start = time.perf_counter()
+  for initial in registers:
+    Computer(*initial, opcode_mapping=OPS).run(decoded)
+  scalar = time.perf_counter() - start
+
+  start = time.perf_counter()
+  BatchComputer(registers, opcode_mapping=OPS).run(decoded)
+  batched = time.perf_counter() - start
 
-def computer_from(blah):
+  print('run:   %.0f machine-instructions/s' % (length * machines / scalar))
+  print('batch: %.0f machine-instructions/s' % (length * machines / batched))
+
+def registers_from(line):
   """
-  >>> computer_from('Before: [1, 0, 2, 0]')
-  Computer[1, 0, 2, 0]
+  >>> registers_from('Before: [1, 0, 2, 0]')
+  (1, 0, 2, 0)
   """
-  numbers = blah.partition(':')[2].lstrip()
-  return Computer(*(int(b) for b in numbers[1:-1].split(', ')))
+  return tuple(int(b) for b in line.partition('[')[2].partition(']')[0].split(','))
 
 def parse(stream):
   """
+  Returns a generator of (before, operation, after) sample tuples and a
+  generator of program instructions, both read lazily from the stream's
+  line iterator. Iterating the program drains any unread samples first.
+
   >>> inp = r'''
   ... Before: [1, 0, 2, 0]
   ... 4 1 0 1
@@ -123,8 +279,8 @@ def parse(stream):
   ... 
   ... f'''
   >>> samples, _ = parse(StringIO(dedent(inp).strip()))
-  >>> samples
-  [(Computer[1, 0, 2, 0], [4, 1, 0, 1], Computer[1, 1, 2, 0]), (Computer[2, 3, 1, 2], [2, 1, 0, 1], Computer[2, 1, 1, 2])]
+  >>> list(samples)
+  [((1, 0, 2, 0), (4, 1, 0, 1), (1, 1, 2, 0)), ((2, 3, 1, 2), (2, 1, 0, 1), (2, 1, 1, 2))]
   
   >>> inp = r'''
   ... Before: [2, 0, 1, 0]
@@ -138,71 +294,221 @@ def parse(stream):
   ... 9 0 1 2
   ... 3 1 2 2
   ... '''
-  >>> samples, _ = parse(StringIO(dedent(inp).strip()))
-  >>> samples
-  [(Computer[2, 0, 1, 0], [11, 1, 0, 2], Computer[2, 0, 1, 0])]
-  """
-  lines = [l.strip() for l in stream.readlines()]
-  groups = grouplen(lines, 4)
-  samples = []
-  for i, group in enumerate(groups):
-    if len(group) != 4: break
-    if group[0] == '': break
-    
-    before, operation, after, _ = group
+  >>> samples, program = parse(StringIO(dedent(inp).strip()))
+  >>> list(samples)
+  [((2, 0, 1, 0), (11, 1, 0, 2), (2, 0, 1, 0))]
+  >>> list(program)
+  [(9, 3, 3, 0), (9, 1, 0, 1), (9, 0, 1, 2), (3, 1, 2, 2)]
+  >>> _, program = parse(StringIO(dedent(inp).strip()))
+  >>> next(program)
+  (9, 3, 3, 0)
+  """
+  lines = iter(stream)
+  first_instruction = []
 
-    before = computer_from(before)
-    operation = [int(b) for b in operation.split(' ')]
-    after = computer_from(after)
+  def read_samples():
+    for line in lines:
+      if line.startswith('Before'):
+        operation = tuple(int(b) for b in next(lines).split())
+        yield (registers_from(line), operation, registers_from(next(lines)))
+      elif line.strip():
+        first_instruction.append(line)
+        return
 
-    samples.append((before, operation, after))
-  
-  program = []
-  for op in lines[(i*4)+2:]:
-    program.append([int(b) for b in op.split(' ')])
-    
-  return (samples, program)
+  def read_program():
+    for _ in samples:
+      pass
+    for line in chain(first_instruction, lines):
+      if line.strip():
+        yield tuple(int(b) for b in line.split())
+
+  samples = read_samples()
+  return samples, read_program()
+
+def sample_mask(before, operation, after):
+  """
+  >>> bin(sample_mask([3, 2, 1, 1], [9, 2, 1, 2], [3, 2, 2, 1]))
+  '0b1000000110'
+  >>> sample_mask([3, 2, 1, 1], [9, 2, 1, 2], [0, 2, 2, 1])
+  0
+  """
+  _, A, B, C = operation
+  for i in range(len(before)):
+    if i != C and before[i] != after[i]:
+      return 0
+
+  expected = after[C]
+  mask = 0
+  for i, op_value in enumerate(OP_TABLE):
+    if op_value(before, A, B) == expected:
+      mask |= 1 << i
+  return mask
 
 def blah(samples):
   """
-  >>> samples = [(Computer(1, 0, 2, 0), [4, 1, 0, 1], Computer(1, 1, 2, 0)), (Computer(2, 3, 1, 2), [2, 1, 0, 1], Computer(2, 1, 1, 2))]
-  >>> blah(samples, 3)
-  1
-  """
-  possibilities = defaultdict(lambda: set())  
-  for initial_before, operation_parameters, after in samples:
-    for operation_name in OPS:
-      before = copy.deepcopy(initial_before)
-      operation = getattr(before, operation_name)
-      operation.__call__(*operation_parameters[1:])
-      
-      if before == after:
-        possibilities[operation_parameters[0]].add(operation_name)
-
-  solved = set()
-  opcodes = [None] * len(OPS)
-  while not len(solved) == len(OPS):
-    for op_number, opcode_possibilities in possibilities.items():
-      opcode_possibilities.difference_update(solved)
-      
-      if len(opcode_possibilities) == 1:
-        operation_name = list(opcode_possibilities)[0]      
-        if opcodes[op_number] and not opcodes[op_number] == operation_name:
-          assert False
-        opcodes[op_number] = operation_name
-        solved.add(operation_name)
-
-  return opcodes
+  >>> rng = random.Random(0)
+  >>> mapping = list(reversed(OPS))
+  >>> samples = []
+  >>> for _ in range(500):
+  ...   before = tuple(rng.randrange(4) for _ in range(4))
+  ...   operation = (rng.randrange(len(OPS)),) + tuple(rng.randrange(4) for _ in range(3))
+  ...   c = Computer(*before, opcode_mapping=mapping)
+  ...   c.execute(*operation)
+  ...   samples.append((before, operation, tuple(c.registers)))
+  >>> blah(samples) == mapping
+  True
+  >>> try:
+  ...   blah(samples[:5])
+  ... except OpcodeMappingException as e:
+  ...   len(e.mappings)
+  100
+  """
+  masks = infer_masks(samples)
+  mappings = [[OPS[v] for v in mapping] for mapping in solve(masks, limit=MAPPING_LIMIT)]
+  if len(mappings) != 1:
+    raise OpcodeMappingException(mappings)
+  return mappings[0]
+
+def infer_masks(samples):
+  """
+  Narrows the candidate ops for each opcode one sample at a time, so only
+  the sixteen masks are held however long the sample log is.
+
+  >>> [bin(mask) for mask in infer_masks([((3, 2, 1, 1), (1, 2, 1, 2), (3, 2, 2, 1))])[:2]]
+  ['0b1111111111111111', '0b1000000110']
+  """
+  masks = [ALL_OPS_MASK] * len(OPS)
+  for before, operation, after in samples:
+    masks[operation[0]] &= sample_mask(before, operation, after)
+  return masks
+
+def bits(mask):
+  while mask:
+    low = mask & -mask
+    yield low.bit_length() - 1
+    mask ^= low
+
+def propagate(masks):
+  """
+  >>> propagate([0b01, 0b11, 0b111])
+  [1, 2, 4]
+  >>> propagate([0b01, 0b01, 0b110]) is None
+  True
+  """
+  masks = list(masks)
+  changed = True
+  while changed:
+    changed = False
+    for u, mask in enumerate(masks):
+      if mask == 0:
+        return None
+      if mask & (mask - 1) == 0:
+        for w in range(len(masks)):
+          if w != u and masks[w] & mask:
+            masks[w] &= ~mask
+            changed = True
+
+    for v in range(len(masks)):
+      holders = [u for u, mask in enumerate(masks) if (mask >> v) & 1]
+      if len(holders) == 0:
+        return None
+      if len(holders) == 1 and masks[holders[0]] != 1 << v:
+        masks[holders[0]] = 1 << v
+        changed = True
+  return masks
+
+def max_matching(masks):
+  """
+  Hopcroft-Karp matching of opcode numbers to op indexes.
+
+  >>> max_matching([0b011, 0b001, 0b110])
+  [1, 0, 2]
+  >>> max_matching([0b001, 0b001, 0b110])
+  [0, None, 1]
+  """
+  match_opcode = [None] * len(masks)
+  match_op = [None] * len(masks)
+
+  def augment(u, dist):
+    for v in bits(masks[u]):
+      w = match_op[v]
+      if w is None or (dist.get(w) == dist[u] + 1 and augment(w, dist)):
+        match_opcode[u] = v
+        match_op[v] = u
+        return True
+    dist[u] = None
+    return False
+
+  while True:
+    queue = [u for u in range(len(masks)) if match_opcode[u] is None]
+    dist = dict((u, 0) for u in queue)
+    found = False
+    for u in queue:
+      for v in bits(masks[u]):
+        w = match_op[v]
+        if w is None:
+          found = True
+        elif w not in dist:
+          dist[w] = dist[u] + 1
+          queue.append(w)
+    if not found:
+      return match_opcode
+
+    for u in range(len(masks)):
+      if match_opcode[u] is None:
+        augment(u, dist)
+
+def solve(masks, limit=None):
+  """
+  >>> solve([0b001, 0b011, 0b111])
+  [[0, 1, 2]]
+  >>> solve([0b011, 0b011, 0b100])
+  [[0, 1, 2], [1, 0, 2]]
+  >>> solve([0b011, 0b011, 0b011])
+  []
+  >>> len(solve([0b111] * 3)), len(solve([0b111] * 3, limit=4))
+  (6, 4)
+  """
+  masks = propagate(masks)
+  if masks is None or None in max_matching(masks):
+    return []
+
+  undecided = [u for u, mask in enumerate(masks) if mask & (mask - 1)]
+  if len(undecided) == 0:
+    return [[mask.bit_length() - 1 for mask in masks]]
+
+  u = min(undecided, key=lambda u: bin(masks[u]).count('1'))
+  mappings = []
+  for v in bits(masks[u]):
+    if limit is not None and len(mappings) >= limit:
+      break
+    trial = list(masks)
+    trial[u] = 1 << v
+    mappings.extend(solve(trial, None if limit is None else limit - len(mappings)))
+  return mappings
     
 if len(sys.argv) == 2 and os.path.isfile(sys.argv[1]):
   samples, program = parse(open(sys.argv[1]))
-  mapping = blah(samples)
+  try:
+    mapping = blah(samples)
+  except OpcodeMappingException as e:
+    eprint('Samples allow %d opcode mappings (showing up to %d):' % (len(e.mappings), MAPPING_LIMIT))
+    for mapping in e.mappings:
+      eprint(' '.join(mapping))
+    sys.exit(1)
 
   c = Computer(opcode_mapping = mapping)
-  for op in program:
-    c.execute(*op)
+  c.run(decode(program))
   print(c)
 
+elif len(sys.argv) >= 2 and sys.argv[1] == 'bench':
+  benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+
+elif len(sys.argv) >= 2 and sys.argv[1] == 'batch':
+  length = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+  machines = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+  batch_benchmark(length, machines)
+
 else:
   import doctest
   doctest.testmod(verbose=True)
@@ -55,10 +55,29 @@ import sys
 from textwrap import dedent
 from itertools import product, chain
 from io import StringIO
+from collections import defaultdict
+from bisect import bisect_left, bisect_right
 import os.path
+import time
 
 SPRING_LOC = (500, 0)
 
+SAND, CLAY, FLOWING, SETTLED = range(4)
+CELL_CHARS = b'.#|~'
+
+
+def parse_veins(stream):
+    """
+    >>> list(parse_veins(StringIO('x=495, y=2..7\\ny=7, x=495..501\\n')))
+    [(range(495, 496), range(2, 8)), (range(495, 502), range(7, 8))]
+    """
+    for line in stream:
+        x_str, y_str = (l[2:] for l in sorted(line.strip().split(', ')))
+        yield (parse_range(x_str), parse_range(y_str))
+
+def parse_range(s):
+    a = [int(l) for l in s.split('..')]
+    return range(a[0], a[-1] + 1)
 
 def parse(stream):
     """
@@ -79,21 +98,7 @@ def parse(stream):
     (495, 0, 506, 13)
     """
     clay = set()
-    for line in stream.readlines():
-        x_str, y_str = (l[2:] for l in sorted(line.strip().split(', ')))
-
-        if '..' in x_str:
-            a=[int(l) for l in x_str.split('..')]
-            xs = range(a[0], a[1] + 1)
-        else:
-            xs = [int(x_str)]
-
-        if '..' in y_str:
-            a=[int(l) for l in y_str.split('..')]
-            ys = range(a[0], a[1] + 1)
-        else:
-            ys = [int(y_str)]
-        
+    for xs, ys in parse_veins(stream):
         clay.update(set(product(xs, ys)))
 
     size = [SPRING_LOC[0], SPRING_LOC[1], SPRING_LOC[0], SPRING_LOC[1]]
@@ -107,7 +112,7 @@ def parse(stream):
 
 def print_state(clay, size, settled_water, flowing_water):
     """
-    >>> clay = set((500, 1))
+    >>> clay = set()
     >>> size = (499, 0, 501, 1)
     >>> settled_water = set()
     >>> flowing_water = []
@@ -149,20 +154,25 @@ def print_state(clay, size, settled_water, flowing_water):
     ···#·····#··
     ···#######··
     """
-    for y in range(size[1], size[3]+1):
-        for x in range(size[0], size[2]+1):
-            loc = (x, y)
-            if loc in clay:
-                print('#', end='')
-            elif loc in settled_water:
-                print('~', end='')
-            elif loc == SPRING_LOC:
-                print('+', end='')
-            elif loc in flowing_water:
-                print('|', end='')
-            else:
-                print('·', end='')
-        print()
+    width = size[2] - size[0] + 1
+    height = size[3] - size[1] + 1
+    grid = bytearray(b'.') * (width * height)
+    flowing_water = [loc for loc in flowing_water if loc is not None]
+    for char, cells in ((b'|', flowing_water), (b'+', [SPRING_LOC]), (b'~', settled_water), (b'#', clay)):
+        for loc in cells:
+            if size[0] <= loc[0] <= size[2] and size[1] <= loc[1] <= size[3]:
+                grid[(loc[1] - size[1]) * width + loc[0] - size[0]] = char[0]
+
+    rows = [grid[i:i+width] for i in range(0, len(grid), width)]
+    write_bytes((b'\n'.join(rows) + b'\n').replace(b'.', '·'.encode('utf-8')))
+
+def write_bytes(out):
+    sys.stdout.flush()
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if buffer is None:
+        sys.stdout.write(out.decode('utf-8'))
+    else:
+        buffer.write(out)
 
 def step(clay, size, settled_water, flowing_water):
     """
@@ -238,6 +248,551 @@ def step(clay, size, settled_water, flowing_water):
     
     return (settled_water, flowing_water)
 
+class Grid(object):
+    """
+    Dense cell states over the clay bounding box, padded by a column on each
+    side so water can run off the outermost clay.
+
+    >>> inp = r'''
+    ... x=495, y=2..7
+    ... y=7, x=495..501
+    ... x=501, y=3..7
+    ... x=498, y=2..4
+    ... x=506, y=1..2
+    ... x=498, y=10..13
+    ... x=504, y=10..13
+    ... y=13, x=498..504
+    ... '''
+    >>> grid = Grid(*parse(StringIO(dedent(inp).strip())))
+    >>> grid.fill()
+    >>> grid.render()
+    ······+·······
+    ······|·····#·
+    ·#··#||||···#·
+    ·#··#~~#|·····
+    ·#··#~~#|·····
+    ·#~~~~~#|·····
+    ·#~~~~~#|·····
+    ·#######|·····
+    ········|·····
+    ···|||||||||··
+    ···|#~~~~~#|··
+    ···|#~~~~~#|··
+    ···|#~~~~~#|··
+    ···|#######|··
+
+    A basin that fills up settles back up the stream that fed it, and that
+    stream's row is scanned again:
+
+    >>> inp = r'''
+    ... y=3, x=488..488
+    ... y=2, x=499..504
+    ... y=4, x=489..494
+    ... y=3, x=491..501
+    ... y=1, x=493..494
+    ... y=2, x=487..488
+    ... '''
+    >>> grid = Grid(*parse(StringIO(dedent(inp).strip())))
+    >>> grid.fill()
+    >>> grid.render()
+    ··············+·····
+    ·······##|||||||||||
+    ·##~~~~~~~~~~######|
+    ··#~~###########···|
+    ···######··········|
+    >>> grid.counts()
+    (26, 12)
+
+    >>> inp = r'''
+    ... x=504, y=1..5
+    ... y=2, x=496..502
+    ... x=498, y=3..11
+    ... y=6, x=498..505
+    ... x=500, y=4..4
+    ... '''
+    >>> grid = Grid(*parse(StringIO(dedent(inp).strip())))
+    >>> grid.fill()
+    >>> grid.render()
+    ·····+······
+    |||||||||#··
+    |#######~#··
+    |··#~~~~~#··
+    |··#~#~~~#··
+    |··#~~~~~#··
+    |··########·
+    |··#········
+    |··#········
+    |··#········
+    |··#········
+    |··#········
+    >>> grid.counts()
+    (34, 15)
+    """
+    def __init__(self, clay, size):
+        self.clay_top = min(y for _, y in clay)
+        self.left = size[0] - 1
+        self.top = size[1]
+        self.width = size[2] - size[0] + 3
+        self.height = size[3] - size[1] + 1
+        self.cells = bytearray(self.width * self.height)
+        for x, y in clay:
+            self.cells[self.index(x, y)] = CLAY
+        self.spring = self.index(*SPRING_LOC)
+
+    def index(self, x, y):
+        return (y - self.top) * self.width + x - self.left
+
+    def fill(self, progress=None, interval=1.0):
+        """
+        Pours from the spring depth first, keeping every falling stream on a
+        stack as [source, cell, spills]: the cell it falls from, the row it
+        is filling, and the spill points of that row still to pour (None
+        while the row needs scanning). When water settles all the way back
+        up to a stream's source, the stream that fed it rescans its row. The
+        spring has nothing feeding it, so its stream counts from the cell
+        above it and water may rise into the spring's own row.
+        progress, if given, is called as
+        progress(grid, pending_streams, elapsed) every interval seconds and
+        once at the end.
+        """
+        streams = [[self.above(self.spring), self.fall(self.spring), None]]
+        started = reported = time.perf_counter()
+        while streams:
+            stream = streams[-1]
+            source, cell, spills = stream
+            if cell is None:
+                streams.pop()
+            elif spills is None:
+                spills, cell = self.spread(source, cell)
+                if spills is None and cell is None:
+                    streams.pop()
+                    if streams:
+                        streams[-1][2] = None
+                else:
+                    stream[1], stream[2] = cell, spills
+            elif spills:
+                spill = spills.pop()
+                streams.append([spill, self.fall(spill), None])
+            else:
+                streams.pop()
+            if progress is not None and time.perf_counter() - reported >= interval:
+                reported = time.perf_counter()
+                progress(self, len(streams), reported - started)
+        if progress is not None:
+            progress(self, 0, time.perf_counter() - started)
+
+    def counts(self):
+        """
+        Returns (reachable, settled) cell counts between the highest and
+        lowest clay rows.
+        """
+        start = self.index(self.left, self.clay_top)
+        settled = self.cells.count(SETTLED, start)
+        return settled + self.cells.count(FLOWING, start), settled
+
+    def above(self, i):
+        return i - self.width
+
+    def fall(self, i):
+        """
+        Lets water fall from cell i. Returns the cell it comes to rest on
+        clay or settled water, or None if it runs off the bottom or into
+        flowing water.
+        """
+        cells = self.cells
+        width = self.width
+        last_row = len(cells) - width
+        while True:
+            if i >= last_row:
+                return None
+            below = cells[i + width]
+            if below == FLOWING:
+                return None
+            if below != SAND:
+                return i
+            i += width
+            cells[i] = FLOWING
+
+    def spread(self, source, i):
+        """
+        Fills the row at cell i, on the stream falling from source. A row
+        that spills flows, and (spill points, i) is returned. A row held by
+        clay on both sides settles, and (None, next cell up the stream) is
+        returned, with None for the cell once the water reaches source's
+        row.
+        """
+        cells = self.cells
+        left, left_wall = self.scan_left(i)
+        right, right_wall = self.scan_right(i)
+        if left_wall and right_wall:
+            cells[left:right + 1] = bytes((SETTLED,)) * (right + 1 - left)
+            i -= self.width
+            return None, (i if i > source else None)
+        cells[left:right + 1] = bytes((FLOWING,)) * (right + 1 - left)
+        return [edge for edge, wall in ((left, left_wall), (right, right_wall)) if not wall], i
+
+    def scan_left(self, i):
+        """
+        Finds how far water at cell i spreads left: to the cell beside the
+        nearest clay if the row below holds it up all the way, otherwise to
+        the nearest cell with nothing solid under it.
+        """
+        cells = self.cells
+        width = self.width
+        row_start = i - i % width
+        wall = cells.rfind(CLAY, row_start, i)
+        start = wall + 1 if wall >= 0 else row_start
+        hole = max(cells.rfind(SAND, start + width, i + width + 1),
+                   cells.rfind(FLOWING, start + width, i + width + 1))
+        if hole >= 0:
+            return hole - width, False
+        return start, True
+
+    def scan_right(self, i):
+        cells = self.cells
+        width = self.width
+        row_end = i - i % width + width
+        wall = cells.find(CLAY, i, row_end)
+        end = wall if wall >= 0 else row_end
+        holes = [hole for hole in (cells.find(SAND, i + width, end + width),
+                                   cells.find(FLOWING, i + width, end + width)) if hole >= 0]
+        if holes:
+            return min(holes) - width, False
+        return end - 1, True
+
+    def render(self):
+        rows = bytes(self.cells).translate(bytes.maketrans(bytes(range(len(CELL_CHARS))), CELL_CHARS))
+        rows = bytearray(rows)
+        rows[self.index(*SPRING_LOC)] = ord('+')
+        lines = [rows[i:i+self.width] for i in range(0, len(rows), self.width)]
+        write_bytes((b'\n'.join(lines) + b'\n').replace(b'.', '·'.encode('utf-8')))
+
+class ClayColumns(object):
+    """
+    Clay kept as sorted, merged y-intervals per column, so very tall scans
+    cost memory per vein rather than per cell.
+
+    >>> columns = ClayColumns([(range(495, 496), range(2, 8)), (range(495, 502), range(7, 8)), (range(495, 496), range(10, 12))])
+    >>> columns.starts[495], columns.ends[495]
+    ([2, 10], [7, 11])
+    >>> columns.is_clay(495, 7), columns.is_clay(495, 8), columns.is_clay(496, 7)
+    (True, False, True)
+    >>> columns.next_clay_below(495, 0), columns.next_clay_below(495, 7), columns.next_clay_below(495, 11)
+    (2, 10, None)
+    >>> columns.interval_top(495, 5), columns.last_clay_above(495, 9), columns.last_clay_above(495, 2)
+    (2, 7, None)
+    >>> columns.size
+    (495, 0, 501, 11)
+    """
+    def __init__(self, veins):
+        intervals = defaultdict(list)
+        for xs, ys in veins:
+            for x in xs:
+                intervals[x].append((ys[0], ys[-1]))
+
+        self.starts = {}
+        self.ends = {}
+        for x, column in intervals.items():
+            starts, ends = [], []
+            for start, end in sorted(column):
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.starts[x] = starts
+            self.ends[x] = ends
+
+        self.top = min(starts[0] for starts in self.starts.values())
+        self.size = (min(min(self.starts), SPRING_LOC[0]), min(self.top, SPRING_LOC[1]),
+                     max(max(self.starts), SPRING_LOC[0]), max(ends[-1] for ends in self.ends.values()))
+
+    def is_clay(self, x, y):
+        starts = self.starts.get(x)
+        if starts is None:
+            return False
+        i = bisect_right(starts, y) - 1
+        return i >= 0 and self.ends[x][i] >= y
+
+    def interval_top(self, x, y):
+        """
+        The top row of the clay interval holding (x, y), which must be clay.
+        """
+        return self.starts[x][bisect_right(self.starts[x], y) - 1]
+
+    def last_clay_above(self, x, y):
+        """
+        The lowest clay row above (x, y), which must not be clay.
+        """
+        ends = self.ends.get(x)
+        if ends is None:
+            return None
+        i = bisect_left(ends, y) - 1
+        if i < 0:
+            return None
+        return ends[i]
+
+    def next_clay_below(self, x, y):
+        ends = self.ends.get(x)
+        if ends is None:
+            return None
+        i = bisect_left(ends, y + 1)
+        if i == len(ends):
+            return None
+        return max(self.starts[x][i], y + 1)
+
+class WaterColumns(object):
+    """
+    Water kept like ClayColumns, as per-column intervals that each carry a
+    state. Painting merges neighbours in the same state, so a long fall or a
+    deep pool stays a single interval.
+
+    >>> water = WaterColumns()
+    >>> water.paint(500, 1, 9, FLOWING)
+    >>> water.paint(500, 5, 5, SETTLED)
+    >>> water.paint(500, 6, 6, SETTLED)
+    >>> water.starts[500], water.ends[500], water.states[500]
+    ([1, 5, 7], [4, 6, 9], [2, 3, 2])
+    >>> water.get(500, 6), water.get(500, 10), water.next_below(500, 2)
+    (3, None, (3, 2))
+    >>> water.counts(3)
+    (7, 2)
+    """
+    def __init__(self):
+        self.starts = defaultdict(list)
+        self.ends = defaultdict(list)
+        self.states = defaultdict(list)
+
+    def get(self, x, y):
+        starts = self.starts[x]
+        i = bisect_right(starts, y) - 1
+        if i >= 0 and self.ends[x][i] >= y:
+            return self.states[x][i]
+        return None
+
+    def next_below(self, x, y):
+        ends = self.ends[x]
+        i = bisect_left(ends, y + 1)
+        if i == len(ends):
+            return None
+        return max(self.starts[x][i], y + 1), self.states[x][i]
+
+    def paint(self, x, top, bottom, state):
+        starts, ends, states = self.starts[x], self.ends[x], self.states[x]
+        lo = bisect_left(ends, top - 1)
+        hi = bisect_right(starts, bottom + 1)
+
+        before, after = [], []
+        for s, e, st in zip(starts[lo:hi], ends[lo:hi], states[lo:hi]):
+            if st == state:
+                top, bottom = min(top, s), max(bottom, e)
+                continue
+            if s < top:
+                before.append((s, min(e, top - 1), st))
+            if e > bottom:
+                after.append((max(s, bottom + 1), e, st))
+
+        intervals = before + [(top, bottom, state)] + after
+        starts[lo:hi] = [s for s, _, _ in intervals]
+        ends[lo:hi] = [e for _, e, _ in intervals]
+        states[lo:hi] = [st for _, _, st in intervals]
+
+    def counts(self, top):
+        reachable = settled = 0
+        for x, ends in self.ends.items():
+            for s, e, st in zip(self.starts[x], ends, self.states[x]):
+                cells = e - max(s, top) + 1
+                if cells > 0:
+                    reachable += cells
+                    if st == SETTLED:
+                        settled += cells
+        return reachable, settled
+
+class SparseGrid(object):
+    """
+    The Grid engine over ClayColumns and WaterColumns. Falling water jumps
+    straight to the next clay or water below by binary search.
+
+    >>> inp = r'''
+    ... x=495, y=2..7
+    ... y=7, x=495..501
+    ... x=501, y=3..7
+    ... x=498, y=2..4
+    ... x=506, y=1..2
+    ... x=498, y=10..13
+    ... x=504, y=10..13
+    ... y=13, x=498..504
+    ... '''
+    >>> grid = SparseGrid(ClayColumns(parse_veins(StringIO(dedent(inp).strip()))))
+    >>> grid.fill()
+    >>> grid.counts()
+    (57, 29)
+
+    >>> inp = r'''
+    ... x=504, y=1..5
+    ... y=2, x=496..502
+    ... x=498, y=3..11
+    ... y=6, x=498..505
+    ... x=500, y=4..4
+    ... '''
+    >>> grid = SparseGrid(ClayColumns(parse_veins(StringIO(dedent(inp).strip()))))
+    >>> grid.fill()
+    >>> grid.counts()
+    (34, 15)
+    >>> grid.water.get(503, 2) == SETTLED, grid.water.get(499, 2)
+    (True, None)
+    """
+    def __init__(self, clay):
+        self.clay = clay
+        self.clay_top = clay.top
+        self.bottom = clay.size[3]
+        self.water = WaterColumns()
+        self.spring = SPRING_LOC
+
+    fill = Grid.fill
+
+    def above(self, source):
+        return (source[0], source[1] - 1)
+
+    def fall(self, source):
+        """
+        Grid.fall, jumping straight to the next clay or water below.
+        """
+        x, y = source
+        water = self.water
+
+        floor = self.clay.next_clay_below(x, y)
+        if floor is None:
+            floor = self.bottom + 1
+        wet = water.next_below(x, y)
+        if wet is not None and wet[0] < floor:
+            floor, below = wet
+            if below == FLOWING:
+                if y + 1 < floor:
+                    water.paint(x, y + 1, floor - 1, FLOWING)
+                return None
+        if y + 1 < floor:
+            water.paint(x, y + 1, floor - 1, FLOWING)
+        if floor - 1 >= self.bottom:
+            return None
+        return (x, floor - 1)
+
+    def spread(self, source, cell):
+        """
+        Grid.spread, except that a settling row settles every row above it
+        with the same extents at once, up to but not into source's row.
+        """
+        x, y = cell
+        water = self.water
+        left, left_wall = self.scan(x, y, -1)
+        right, right_wall = self.scan(x, y, 1)
+        if not (left_wall and right_wall):
+            for cx in range(left, right + 1):
+                water.paint(cx, y, y, FLOWING)
+            return [(edge, y) for edge, wall in ((left, left_wall), (right, right_wall)) if not wall], cell
+
+        top = max(self.basin_top(left, right, y), min(source[1] + 1, y))
+        for cx in range(left, right + 1):
+            water.paint(cx, top, y, SETTLED)
+        return None, ((x, top - 1) if top - 1 > source[1] else None)
+
+    def basin_top(self, left, right, y):
+        """
+        The highest row that settles with the same extents as row y: both
+        walls still stand and no clay juts in between, so every row from
+        there down to y fills wall to wall.
+        """
+        clay = self.clay
+        top = max(clay.interval_top(left - 1, y), clay.interval_top(right + 1, y))
+        for cx in range(left, right + 1):
+            above = clay.last_clay_above(cx, y)
+            if above is not None:
+                top = max(top, above + 1)
+        return top
+
+    def scan(self, x, y, dx):
+        is_clay = self.clay.is_clay
+        water = self.water
+        while True:
+            if not (is_clay(x, y + 1) or water.get(x, y + 1) == SETTLED):
+                return x, False
+            if is_clay(x + dx, y):
+                return x, True
+            x += dx
+
+    def counts(self):
+        return self.water.counts(self.clay_top)
+
+def report_progress(grid, pending_streams, elapsed):
+    _, settled = grid.counts()
+    rate = settled / elapsed if elapsed else 0
+    eprint('%.3fs: %d settled (%.0f/s), %d streams pending' % (elapsed, settled, rate, pending_streams))
+
+def solve(stream, interval=None, sparse=False):
+    """
+    >>> inp = r'''
+    ... x=495, y=2..7
+    ... y=7, x=495..501
+    ... x=501, y=3..7
+    ... x=498, y=2..4
+    ... x=506, y=1..2
+    ... x=498, y=10..13
+    ... x=504, y=10..13
+    ... y=13, x=498..504
+    ... '''
+    >>> solve(StringIO(dedent(inp).strip()))
+    (57, 29)
+    >>> solve(StringIO(dedent(inp).strip()), sparse=True)
+    (57, 29)
+
+    A spill that fills a lower basin, which then holds up the row it
+    spilled from:
+
+    >>> inp = r'''
+    ... y=3, x=488..488
+    ... y=2, x=499..504
+    ... y=4, x=489..494
+    ... y=3, x=491..501
+    ... y=1, x=493..494
+    ... y=2, x=487..488
+    ... '''
+    >>> solve(StringIO(dedent(inp).strip())), solve(StringIO(dedent(inp).strip()), sparse=True)
+    ((26, 12), (26, 12))
+
+    A basin under a clay ceiling that settles back up a side stream before
+    the stream it spilled from is scanned again:
+
+    >>> inp = r'''
+    ... x=504, y=1..5
+    ... y=2, x=496..502
+    ... x=498, y=3..11
+    ... y=6, x=498..505
+    ... x=500, y=4..4
+    ... '''
+    >>> solve(StringIO(dedent(inp).strip())), solve(StringIO(dedent(inp).strip()), sparse=True)
+    ((34, 15), (34, 15))
+
+    A basin around the spring that overflows through the spring's row:
+
+    >>> inp = r'''
+    ... x=497, y=1..3
+    ... x=503, y=1..3
+    ... y=4, x=497..503
+    ... y=10, x=490..510
+    ... '''
+    >>> solve(StringIO(dedent(inp).strip())), solve(StringIO(dedent(inp).strip()), sparse=True)
+    ((56, 15), (56, 15))
+    """
+    if sparse:
+        grid = SparseGrid(ClayColumns(parse_veins(stream)))
+    else:
+        grid = Grid(*parse(stream))
+    grid.fill(None if interval is None else report_progress, interval)
+    return grid.counts()
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
 def next_positions(size, origin):    
     flowing_x, flowing_y = origin
     for x,y in [(flowing_x, flowing_y+1), (flowing_x-1, flowing_y), (flowing_x+1, flowing_y)]:
@@ -247,8 +802,14 @@ def next_positions(size, origin):
             yield(None)
 
 if len(sys.argv) == 2 and os.path.isfile(sys.argv[1]):
-    clay, size = parse(open(sys.argv[1]))
-    print_state(clay, size, set(), [SPRING_LOC])
+    reachable, settled = solve(open(sys.argv[1]), interval=1.0)
+    print(reachable)
+    print(settled)
+
+elif len(sys.argv) == 3 and sys.argv[1] == 'sparse' and os.path.isfile(sys.argv[2]):
+    reachable, settled = solve(open(sys.argv[2]), interval=1.0, sparse=True)
+    print(reachable)
+    print(settled)
 
 else:
     import doctest
@@ -2,6 +2,8 @@
 
 import sys
 import os.path
+import random
+import time
 from io import StringIO
 from collections import defaultdict
 
@@ -12,6 +14,130 @@ def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
     pass
 
+DIRECTIONS = {
+  'N': (0, -1, 1, 4),
+  'E': (1, 0, 2, 8),
+  'S': (0, 1, 4, 1),
+  'W': (-1, 0, 8, 2),
+}
+
+def door_map(stream):
+  """
+  Walks the regex once, carrying the set of positions the text so far can
+  end at. Each open group keeps the positions it started from and the
+  positions its finished alternatives reached; those are merged at '|'
+  and ')', so the work is the regex length times the distinct positions
+  rather than the number of paths. Returns a map of room -> bitmask of
+  its doors.
+
+  >>> sorted(door_map(StringIO('^WNE$')).items())
+  [((-1, -1), 6), ((-1, 0), 3), ((0, -1), 8), ((0, 0), 8)]
+  >>> sorted(door_map(StringIO('^N(E|W)N$')).items())
+  [((-1, -2), 4), ((-1, -1), 3), ((0, -1), 14), ((0, 0), 1), ((1, -2), 4), ((1, -1), 9)]
+  """
+  doors = defaultdict(int)
+  positions = {(0, 0)}
+  stack = []
+  for c in stream.read():
+    if c in DIRECTIONS:
+      dx, dy, door, back_door = DIRECTIONS[c]
+      moved = set()
+      for x, y in positions:
+        doors[(x, y)] |= door
+        doors[(x + dx, y + dy)] |= back_door
+        moved.add((x + dx, y + dy))
+      positions = moved
+    elif c == '(':
+      stack.append((positions, set()))
+    elif c == '|':
+      starts, ends = stack[-1]
+      ends |= positions
+      positions = starts
+    elif c == ')':
+      _, ends = stack.pop()
+      positions = ends | positions
+    elif c == '$':
+      break
+    elif c != '^':
+      eprint("Got a weird character '%s'" % c)
+      assert False
+  return doors
+
+def room_distances(doors):
+  distances = {(0, 0): 0}
+  frontier = [(0, 0)]
+  distance = 0
+  while frontier:
+    distance += 1
+    next_frontier = []
+    for x, y in frontier:
+      for dx, dy, door, _ in DIRECTIONS.values():
+        room = (x + dx, y + dy)
+        if doors[(x, y)] & door and room not in distances:
+          distances[room] = distance
+          next_frontier.append(room)
+    frontier = next_frontier
+  return distances
+
+def furthest_room(doors, threshold=1000):
+  """
+  Returns the most doors needed to reach any room, and how many rooms
+  need at least threshold doors.
+
+  >>> furthest_room(door_map(StringIO('^WNE$')))
+  (3, 0)
+  >>> furthest_room(door_map(StringIO('^ENWWW(NEEE|SSE(EE|N))$')), 10)
+  (10, 1)
+  >>> furthest_room(door_map(StringIO('^ENNWSWW(NEWS|)SSSEEN(WNSE|)EE(SWEN|)NNN$')))
+  (18, 0)
+  >>> furthest_room(door_map(StringIO('^ESSWWN(E|NNENN(EESS(WNSE|)SSS|WWWSSSSE(SW|NNNE)))$')))
+  (23, 0)
+  >>> furthest_room(door_map(StringIO('^WSSEESWWWNW(S|NENNEEEENN(ESSSSW(NWSW|SSEN)|WSWWN(E|WWS(E|SS))))$')))
+  (31, 0)
+  """
+  distances = room_distances(doors).values()
+  return max(distances), sum(1 for d in distances if d >= threshold)
+
+def nested_regex(depth, seed=0):
+  """
+  Builds a regex whose groups nest depth deep, each level followed by a
+  three-way group, so the number of distinct paths grows as 6**depth.
+
+  >>> nested_regex(2, seed=1).count('(')
+  4
+  """
+  rng = random.Random(seed)
+  def steps():
+    return ''.join(rng.choice('NESW') for _ in range(rng.randrange(1, 4)))
+
+  body = steps()
+  for _ in range(depth):
+    body = '%s(%s|%s)(%s|%s|)%s' % (steps(), body, steps(), steps(), steps(), steps())
+  return '^%s$' % body
+
+def detour_regex(depth):
+  """
+  Builds a regex of depth nested (...|) detours that all lead back to the
+  same room, like the (NEWS|) groups in real inputs.
+
+  >>> detour_regex(2)
+  '^N(EN(EW|)SW|)S$'
+  """
+  body = ''
+  for _ in range(depth):
+    body = 'N(E%sW|)S' % body
+  return '^%s$' % body
+
+def benchmark(depths):
+  for name, make_regex in (('nested', nested_regex), ('detour', detour_regex)):
+    for depth in depths:
+      regex = make_regex(depth)
+      start = time.perf_counter()
+      doors = door_map(StringIO(regex))
+      furthest, _ = furthest_room(doors)
+      elapsed = time.perf_counter() - start
+      print('%s depth %4d: %6d chars, %6d rooms, furthest %5d, %.3fs' % (name, depth, len(regex), len(doors), furthest, elapsed))
+
 class State(object):
   def __init__(self):
     self.neighbors = []
@@ -329,13 +455,12 @@ class Machine(object):
   
 
 if len(sys.argv) == 2 and os.path.isfile(sys.argv[1]):
-  m = Machine(open(sys.argv[1]))
-  
-    
-  
-  
-  
-  print(len(m))
+  furthest, far_rooms = furthest_room(door_map(open(sys.argv[1])))
+  print(furthest)
+  print(far_rooms)
+
+elif len(sys.argv) >= 2 and sys.argv[1] == 'bench':
+  benchmark([int(a) for a in sys.argv[2:]] or [50, 60, 80])
 
 else:
     import doctest
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
 import sys
+import heapq
 from collections import defaultdict
-from itertools import product
+
+def parse_edge(line):
+    words = line.split()
+    return (words[1], words[7])
 
 dag = defaultdict(lambda: set())
-edges = [(line[5], line[36]) for line in sys.stdin.readlines()]
+edges = [parse_edge(line) for line in sys.stdin.readlines() if line.strip()]
 nodes = set()
 prereqs = defaultdict(lambda: set())
 for edge_from, edge_to in edges:
@@ -14,14 +18,19 @@ for edge_from, edge_to in edges:
     dag[edge_from].add(edge_to)
     prereqs[edge_to].add(edge_from)
 
-candidate_nodes = set(node for node in nodes if len(prereqs[node]) == 0)
+in_degree = dict((node, len(prereqs[node])) for node in nodes)
+ready_nodes = [node for node in nodes if in_degree[node] == 0]
+heapq.heapify(ready_nodes)
 visited = list()
-while len(candidate_nodes) > 0:
-    prereq_met_nodes = [node for node in candidate_nodes if all(prereq_node in visited for prereq_node in prereqs[node])]
-    prereq_met_nodes.sort()
-    next_node = prereq_met_nodes.pop(0)
-    candidate_nodes.remove(next_node)
+while len(ready_nodes) > 0:
+    next_node = heapq.heappop(ready_nodes)
     visited.append(next_node)
-    candidate_nodes.update(dag[next_node].difference(set(visited)))
-    
-print(''.join(visited))
\ No newline at end of file
+    for node in dag[next_node]:
+        in_degree[node] -= 1
+        if in_degree[node] == 0:
+            heapq.heappush(ready_nodes, node)
+
+assert len(visited) == len(nodes), 'steps form a cycle'
+
+separator = '' if all(len(node) == 1 for node in nodes) else ' '
+print(separator.join(visited))
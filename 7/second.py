@@ -1,15 +1,98 @@
 #!/usr/bin/env python3
 
 import sys
+import heapq
 from collections import defaultdict
-from itertools import product
 
 NUM_WORKERS=5
 NODE_TIME_OFFSET=-4
 
-workers = [None] * NUM_WORKERS
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def parse_edge(line):
+    words = line.split()
+    return (words[1], words[7])
+
+def node_time(node, node_time_offset):
+    return ord(node) + node_time_offset
+
+def simulate(nodes, dag, prereqs, num_workers, node_time_offset):
+    in_degree = dict((node, len(prereqs[node])) for node in nodes)
+    ready_nodes = [node for node in nodes if in_degree[node] == 0]
+    heapq.heapify(ready_nodes)
+    idle_workers = list(range(num_workers))
+    running = []
+    busy_times = [0] * num_workers
+    visited = list()
+    current_time = 0
+    while len(ready_nodes) > 0 or len(running) > 0:
+        while len(ready_nodes) > 0 and len(idle_workers) > 0:
+            next_node = heapq.heappop(ready_nodes)
+            worker = heapq.heappop(idle_workers)
+            duration = node_time(next_node, node_time_offset)
+            busy_times[worker] += duration
+            heapq.heappush(running, (current_time + duration, worker, next_node))
+
+        current_time, worker, node = heapq.heappop(running)
+        finished = [(worker, node)]
+        while len(running) > 0 and running[0][0] == current_time:
+            _, worker, node = heapq.heappop(running)
+            finished.append((worker, node))
+
+        for worker, node in finished:
+            heapq.heappush(idle_workers, worker)
+            visited.append(node)
+            for successor in dag[node]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    heapq.heappush(ready_nodes, successor)
+
+    assert len(visited) == len(nodes), 'steps form a cycle'
+    return (current_time, visited, busy_times)
+
+def critical_path(nodes, dag, prereqs, node_time_offset):
+    in_degree = dict((node, len(prereqs[node])) for node in nodes)
+    ready_nodes = [node for node in nodes if in_degree[node] == 0]
+    finish_times = defaultdict(lambda: 0)
+    while len(ready_nodes) > 0:
+        node = ready_nodes.pop()
+        finish_times[node] = max((finish_times[p] for p in prereqs[node]), default=0) + node_time(node, node_time_offset)
+        for successor in dag[node]:
+            in_degree[successor] -= 1
+            if in_degree[successor] == 0:
+                ready_nodes.append(successor)
+    return max(finish_times.values(), default=0)
+
+def sweep(nodes, dag, prereqs, max_workers, node_time_offset):
+    bound = critical_path(nodes, dag, prereqs, node_time_offset)
+    print('critical path: %d' % bound)
+    print('%7s %8s %11s' % ('workers', 'makespan', 'utilisation'))
+    cheapest = None
+    for num_workers in range(1, max_workers + 1):
+        total_time, _, busy_times = simulate(nodes, dag, prereqs, num_workers, node_time_offset)
+        utilisation = 100.0 * sum(busy_times) / max(total_time * num_workers, 1)
+        marker = ''
+        if cheapest is None and total_time == bound:
+            cheapest = num_workers
+            marker = '  <- cheapest at critical path'
+        print('%7d %8d %10.1f%%%s' % (num_workers, total_time, utilisation, marker))
+    return cheapest
+
+args = sys.argv[1:]
+sweep_mode = len(args) > 0 and args[0] == 'sweep'
+if sweep_mode:
+    args = args[1:]
+if len(args) > 0:
+    NUM_WORKERS = int(args[0])
+if len(args) > 1:
+    NODE_TIME_OFFSET = int(args[1])
+if NUM_WORKERS < 1:
+    eprint('need at least one worker, got %d' % NUM_WORKERS)
+    sys.exit(1)
+
 dag = defaultdict(lambda: set())
-edges = [(line[5], line[36]) for line in sys.stdin.readlines()]
+edges = [parse_edge(line) for line in sys.stdin.readlines() if line.strip()]
 nodes = set()
 prereqs = defaultdict(lambda: set())
 for edge_from, edge_to in edges:
@@ -18,27 +101,16 @@ for edge_from, edge_to in edges:
     dag[edge_from].add(edge_to)
     prereqs[edge_to].add(edge_from)
 
-current_time = 0
-candidate_nodes = set(node for node in nodes if len(prereqs[node]) == 0)
-finish_times = defaultdict(lambda: 0)
-visited = list()
-finished = set()
-while not (len(visited) == len(nodes) and all(w is None for w in workers)):
-    for i,w in enumerate(workers):
-        if w and finish_times[w]==current_time:
-            candidate_nodes.update(dag[w].difference(set(visited)))
-            visited.append(w)
-            workers[i]=None
-    
-    while len(candidate_nodes) > 0 and None in workers:
-        prereq_met_nodes = [node for node in candidate_nodes if all(prereq_node in visited for prereq_node in prereqs[node])]
-        if len(prereq_met_nodes) == 0: break
-        prereq_met_nodes.sort()
-        next_node = prereq_met_nodes.pop(0)
-        candidate_nodes.remove(next_node)
-        finish_times[next_node] = current_time+ord(next_node)+NODE_TIME_OFFSET
-        workers[workers.index(None)] = next_node
-    
-    current_time += 1
-    
-print(finish_times[visited[-1]])
+long_names = sorted(node for node in nodes if len(node) != 1)
+if len(long_names) > 0:
+    eprint('step durations are only defined for single-letter steps: %s' % ' '.join(long_names))
+    sys.exit(1)
+
+if sweep_mode:
+    sweep(nodes, dag, prereqs, NUM_WORKERS, NODE_TIME_OFFSET)
+    sys.exit(0)
+
+total_time, visited, busy_times = simulate(nodes, dag, prereqs, NUM_WORKERS, NODE_TIME_OFFSET)
+print(total_time)
+for worker, busy_time in enumerate(busy_times):
+    eprint('worker %d: %d/%d (%.1f%%)' % (worker, busy_time, total_time, 100.0 * busy_time / max(total_time, 1)))
@@ -1,29 +1,50 @@
 #!/usr/bin/env python3
 
 import sys
+from array import array
+from collections import namedtuple
+
+Tree = namedtuple('Tree', ['child_counts', 'children_starts', 'children', 'metadata_counts', 'metadata_starts'])
 
-offset=0
 def parse(inp):
-    global offset
-    child_count = inp[0+offset]
-    metadata_count = inp[1+offset]
-    offset += 2
-    children = []
-    for i in range(child_count):
-        child, metadata = parse(inp)
-        children.append((child, metadata))
-    metadata = inp[offset:offset+metadata_count]
-    offset += metadata_count
-    return (children, metadata)
-
-inp = [int(i) for i in sys.stdin.read().strip().split(' ')]
+    child_counts = array('i')
+    children_starts = array('i')
+    children = array('i')
+    metadata_counts = array('i')
+    metadata_starts = array('i')
+    remaining = array('i')
+
+    def add_node(offset):
+        child_counts.append(inp[offset])
+        metadata_counts.append(inp[offset+1])
+        metadata_starts.append(0)
+        children_starts.append(len(children))
+        children.extend(array('i', [0]) * inp[offset])
+        remaining.append(inp[offset])
+        return len(child_counts) - 1
+
+    stack = [add_node(0)]
+    offset = 2
+    while len(stack) > 0:
+        node = stack[-1]
+        if remaining[node] > 0:
+            slot = children_starts[node] + child_counts[node] - remaining[node]
+            remaining[node] -= 1
+            child = add_node(offset)
+            offset += 2
+            children[slot] = child
+            stack.append(child)
+        else:
+            stack.pop()
+            metadata_starts[node] = offset
+            offset += metadata_counts[node]
+    return Tree(child_counts, children_starts, children, metadata_counts, metadata_starts)
+
+inp = array('i', (int(i) for i in sys.stdin.read().split()))
 tree = parse(inp)
 
-nodes = [tree]
 metadata_sum = 0
-while len(nodes) != 0:
-    node = nodes.pop(0)
-    nodes.extend(node[0])
-    metadata_sum += sum(node[1])
+for start, count in zip(tree.metadata_starts, tree.metadata_counts):
+    metadata_sum += sum(inp[start:start+count])
 
 print(metadata_sum)
@@ -1,40 +1,60 @@
 #!/usr/bin/env python3
 
 import sys
+from array import array
+from collections import namedtuple
+
+Tree = namedtuple('Tree', ['child_counts', 'children_starts', 'children', 'metadata_counts', 'metadata_starts'])
 
-offset=0
 def parse(inp):
-    global offset
-    child_count = inp[0+offset]
-    metadata_count = inp[1+offset]
-    offset += 2
-    children = []
-    for i in range(child_count):
-        child, metadata = parse(inp)
-        children.append((child, metadata))
-    metadata = inp[offset:offset+metadata_count]
-    offset += metadata_count
-    return (children, metadata)
-
-def sum_children(node):
-    if len(node[0]) == 0:
-        nodes = [(node)]
-        metadata_sum = 0
-        while len(nodes) != 0:
-            node = nodes.pop(0)
-            nodes.extend(node[0])
-            metadata_sum += sum(node[1])
-        return metadata_sum
-    
-    val = 0
-    for index in node[1]:
-        child_count = len(node[0])
-        if index > 0 and index <= child_count:
-            val += sum_children(node[0][index-1])
-    return val
-
-inp = [int(i) for i in sys.stdin.read().strip().split(' ')]
+    child_counts = array('i')
+    children_starts = array('i')
+    children = array('i')
+    metadata_counts = array('i')
+    metadata_starts = array('i')
+    remaining = array('i')
+
+    def add_node(offset):
+        child_counts.append(inp[offset])
+        metadata_counts.append(inp[offset+1])
+        metadata_starts.append(0)
+        children_starts.append(len(children))
+        children.extend(array('i', [0]) * inp[offset])
+        remaining.append(inp[offset])
+        return len(child_counts) - 1
+
+    stack = [add_node(0)]
+    offset = 2
+    while len(stack) > 0:
+        node = stack[-1]
+        if remaining[node] > 0:
+            slot = children_starts[node] + child_counts[node] - remaining[node]
+            remaining[node] -= 1
+            child = add_node(offset)
+            offset += 2
+            children[slot] = child
+            stack.append(child)
+        else:
+            stack.pop()
+            metadata_starts[node] = offset
+            offset += metadata_counts[node]
+    return Tree(child_counts, children_starts, children, metadata_counts, metadata_starts)
+
+def node_values(inp, tree):
+    values = [0] * len(tree.child_counts)
+    for node in reversed(range(len(tree.child_counts))):
+        start = tree.metadata_starts[node]
+        metadata = inp[start:start+tree.metadata_counts[node]]
+        child_count = tree.child_counts[node]
+        if child_count == 0:
+            values[node] = sum(metadata)
+        else:
+            children_start = tree.children_starts[node]
+            values[node] = sum(values[tree.children[children_start+index-1]] for index in metadata if index > 0 and index <= child_count)
+    return values
+
+inp = array('i', (int(i) for i in sys.stdin.read().split()))
 tree = parse(inp)
-output = sum_children(tree)
+output = node_values(inp, tree)[0]
 
 print(output)
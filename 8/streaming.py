@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import sys
+
+CHUNK_SIZE = 1 << 16
+
+def numbers(stream):
+    leftover = ''
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        tokens = (leftover + chunk).split()
+        if chunk[-1].isspace():
+            leftover = ''
+        else:
+            leftover = tokens.pop() if len(tokens) > 0 else ''
+        for token in tokens:
+            yield int(token)
+    if leftover:
+        yield int(leftover)
+
+def evaluate(numbers):
+    metadata_sum = 0
+    stack = [[next(numbers), next(numbers), []]]
+    while True:
+        remaining, metadata_count, child_values = stack[-1]
+        if remaining > 0:
+            stack[-1][0] -= 1
+            stack.append([next(numbers), next(numbers), []])
+            continue
+
+        stack.pop()
+        node_sum = 0
+        value = 0
+        child_count = len(child_values)
+        for _ in range(metadata_count):
+            index = next(numbers)
+            node_sum += index
+            if index > 0 and index <= child_count:
+                value += child_values[index-1]
+        metadata_sum += node_sum
+        if child_count == 0:
+            value = node_sum
+
+        if len(stack) == 0:
+            return (metadata_sum, value)
+        stack[-1][2].append(value)
+
+metadata_sum, root_value = evaluate(numbers(sys.stdin))
+print(metadata_sum)
+print(root_value)